@@ -0,0 +1,356 @@
+"""Command line entry point for analyzing many measurements without the GUI."""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core import ONSET_METHODS, PRECISIONS, SeaUrchinAnalyzer
+from engine.plot import W_CHANNEL_DISPLAY_POINTS
+from engine.input import InputFormat
+from utils.audio_stack import input_signature
+from utils.export_data import EXPORT_FORMATS
+from utils.run_context import RunContext
+
+AFORMAT_KEYS = ["front_left_up", "front_right_down", "back_right_up", "back_left_down"]
+BFORMAT_KEYS = ["w_channel", "x_channel", "y_channel", "z_channel"]
+AUDIO_SUFFIXES = (".wav", ".WAV")
+RUN_STAMP = "sugira_run.json"
+
+
+def build_input_dict(
+    paths: Dict[str, str], single_file_bformat: bool = False, streaming: bool = False
+) -> dict:
+    """
+    Builds the input dictionary of one measurement, as the Load Signals window does.
+
+    Parameters
+    ----------
+    paths : Dict[str, str]
+        Audio paths keyed by signal name ("stacked_signals" for one 4-channel file).
+    single_file_bformat : bool, optional
+        Whether a single 4-channel file is B-format instead of A-format,
+        by default False.
+    streaming : bool, optional
+        Whether LSS recordings are deconvolved from disk, by default False.
+
+    Returns
+    -------
+    dict
+        Input dictionary for SeaUrchinAnalyzer.analyze.
+    """
+
+    if "stacked_signals" in paths:
+        if single_file_bformat:
+            mode, frequency_correction = InputFormat.BFORMAT, False
+        else:
+            mode, frequency_correction = InputFormat.AFORMAT, True
+        return {
+            "input_mode": mode,
+            "channels_per_file": 4,
+            "frequency_correction": frequency_correction,
+            "stacked_signals": paths["stacked_signals"],
+        }
+
+    if "inverse_filter" in paths:
+        return {
+            "input_mode": InputFormat.LSS,
+            "channels_per_file": 1,
+            "frequency_correction": True,
+            "streaming": streaming,
+            **{key: paths[key] for key in AFORMAT_KEYS + ["inverse_filter"]},
+        }
+
+    if all(key in paths for key in BFORMAT_KEYS):
+        return {
+            "input_mode": "bformat",
+            "channels_per_file": 1,
+            "frequency_correction": False,
+            **{key: paths[key] for key in BFORMAT_KEYS},
+        }
+
+    return {
+        "input_mode": InputFormat.AFORMAT,
+        "channels_per_file": 1,
+        "frequency_correction": True,
+        **{key: paths[key] for key in AFORMAT_KEYS},
+    }
+
+
+def discover_measurements(
+    input_dir: Path, single_file_bformat: bool = False, streaming: bool = False
+) -> Dict[str, dict]:
+    """
+    Finds the measurements of a directory.
+
+    Every 4-channel audio file in the directory is a measurement. Every
+    subdirectory is a measurement whose files are named after the signals they
+    hold (front_left_up.wav, ..., inverse_filter.wav or w_channel.wav, ...).
+
+    Parameters
+    ----------
+    input_dir : Path
+        Directory with the measurements.
+    single_file_bformat : bool, optional
+        Whether 4-channel files are B-format instead of A-format, by default False.
+    streaming : bool, optional
+        Whether LSS recordings are deconvolved from disk, by default False.
+
+    Returns
+    -------
+    Dict[str, dict]
+        Input dictionaries keyed by measurement name.
+    """
+
+    measurements = {}
+    for entry in sorted(input_dir.iterdir()):
+        if entry.is_file() and entry.suffix in AUDIO_SUFFIXES:
+            paths = {"stacked_signals": str(entry.resolve())}
+        elif entry.is_dir():
+            paths = {
+                audio_path.stem: str(audio_path.resolve())
+                for audio_path in entry.iterdir()
+                if audio_path.suffix in AUDIO_SUFFIXES
+            }
+            if not all(key in paths for key in AFORMAT_KEYS) and not all(
+                key in paths for key in BFORMAT_KEYS
+            ):
+                continue
+        else:
+            continue
+        measurements[entry.stem] = build_input_dict(
+            paths, single_file_bformat, streaming
+        )
+
+    return measurements
+
+
+def read_manifest(manifest_path: Path) -> Dict[str, dict]:
+    """
+    Reads the measurements of a JSON manifest.
+
+    The manifest is a list of objects with a "name", an "input_mode"
+    ("aformat", "bformat" or "lss") and the same keys the Load Signals window
+    produces. Relative paths are resolved from the manifest directory.
+
+    Parameters
+    ----------
+    manifest_path : Path
+        Path to the manifest.
+
+    Returns
+    -------
+    Dict[str, dict]
+        Input dictionaries keyed by measurement name.
+    """
+
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        entries = json.load(file)
+
+    measurements = {}
+    for entry in entries:
+        input_dict = dict(entry)
+        name = input_dict.pop("name")
+        for key in AFORMAT_KEYS + BFORMAT_KEYS + ["stacked_signals", "inverse_filter"]:
+            if key in input_dict:
+                input_dict[key] = str(
+                    (manifest_path.parent / input_dict[key]).resolve()
+                )
+        # Separate B-format files are identified by the plain string mode
+        if not (input_dict["input_mode"] == "bformat" and "w_channel" in input_dict):
+            input_dict["input_mode"] = InputFormat(input_dict["input_mode"])
+        measurements[name] = input_dict
+
+    return measurements
+
+
+def run_signature(input_dict: dict, signal_parameters: dict) -> str:
+    """Identifies the inputs and parameters of a run, to skip unchanged ones."""
+
+    return json.dumps(
+        [input_signature(input_dict), sorted(signal_parameters.items())], default=str
+    )
+
+
+def analyze_measurement(
+    name: str,
+    input_dict: dict,
+    signal_parameters: dict,
+    output_dir: str,
+    assets_dir: Optional[str] = None,
+) -> Tuple[str, str, float]:
+    """
+    Analyzes one measurement, writing its outputs to its own directory.
+
+    Parameters
+    ----------
+    name : str
+        Measurement name.
+    input_dict : dict
+        Input dictionary of the measurement.
+    signal_parameters : dict
+        Analysis parameters.
+    output_dir : str
+        Directory for the outputs of this measurement.
+    assets_dir : Optional[str], optional
+        Directory of the plotly.js asset shared by every measurement. If None,
+        each .html embeds plotly.js, by default None.
+
+    Returns
+    -------
+    Tuple[str, str, float]
+        Measurement name, status ("done" or the error) and elapsed seconds.
+    """
+
+    start = time.perf_counter()
+    try:
+        run_context = RunContext.create(output_dir, assets_dir)
+        SeaUrchinAnalyzer().analyze(
+            input_dict, signal_parameters, run_context=run_context
+        )
+        with open(run_context.path(RUN_STAMP), "w", encoding="utf-8") as file:
+            file.write(run_signature(input_dict, signal_parameters))
+    except Exception as error:  # pylint: disable=broad-except
+        return name, repr(error), time.perf_counter() - start
+
+    return name, "done", time.perf_counter() - start
+
+
+def is_up_to_date(output_dir: Path, input_dict: dict, signal_parameters: dict) -> bool:
+    """Checks whether a measurement was already analyzed with the same inputs."""
+
+    stamp_path = output_dir / RUN_STAMP
+    if not stamp_path.is_file():
+        return False
+
+    return stamp_path.read_text(encoding="utf-8") == run_signature(
+        input_dict, signal_parameters
+    )
+
+
+def parse_arguments(arguments: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Analyze a directory or manifest of Ambisonics measurements."
+    )
+    parser.add_argument("input", type=Path, help="Directory or JSON manifest.")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("sugira_output"), help="Output root."
+    )
+    parser.add_argument("--integration-time", type=float, default=1.0, help="ms")
+    parser.add_argument("--analysis-length", type=float, default=500.0, help="ms")
+    parser.add_argument("--threshold", type=float, default=-60.0, help="dB")
+    parser.add_argument("--no-low-pass", action="store_true")
+    parser.add_argument("--plot-amplitude", action="store_true")
+    parser.add_argument("--level-colorscale", action="store_true")
+    parser.add_argument(
+        "--bformat", action="store_true", help="4-channel files are B-format."
+    )
+    parser.add_argument(
+        "--streaming", action="store_true", help="Deconvolve LSS from disk."
+    )
+    parser.add_argument(
+        "--onset",
+        choices=ONSET_METHODS,
+        default="peak",
+        help="Direct sound detection: absolute peak, -20 dB threshold or matched pulse.",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default="float64",
+        help="Data type the signals are processed in.",
+    )
+    parser.add_argument(
+        "--display-points",
+        type=int,
+        default=W_CHANNEL_DISPLAY_POINTS,
+        help="Points drawn of the W channel (0 draws every sample).",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=EXPORT_FORMATS,
+        default=["txt"],
+        help="Data export formats (parquet and arrow require pyarrow).",
+    )
+    parser.add_argument(
+        "--standalone-html",
+        action="store_true",
+        help="Embed plotly.js in every .html instead of sharing one copy.",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--force", action="store_true", help="Analyze unchanged measurements again."
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: List[str] = None) -> int:
+    args = parse_arguments(sys.argv[1:] if arguments is None else arguments)
+
+    if args.input.is_dir():
+        measurements = discover_measurements(args.input, args.bformat, args.streaming)
+    else:
+        measurements = read_manifest(args.input)
+
+    signal_parameters = {
+        "integration_time": args.integration_time * 10 ** (-3),
+        "analysis_length": args.analysis_length * 10 ** (-3),
+        "intensity_threshold": args.threshold,
+        "low_pass_key": not args.no_low_pass,
+        "plot_energy": not args.plot_amplitude,
+        "time_colorscale": not args.level_colorscale,
+        "export_formats": args.formats,
+        "display_points": args.display_points or None,
+        "onset_method": args.onset,
+        "precision": args.precision,
+    }
+
+    pending = {}
+    for name, input_dict in measurements.items():
+        output_dir = (args.output / name).resolve()
+        if not args.force and is_up_to_date(output_dir, input_dict, signal_parameters):
+            continue
+        pending[name] = (input_dict, str(output_dir))
+    skipped = len(measurements) - len(pending)
+
+    assets_dir = None if args.standalone_html else str(args.output.resolve())
+
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(
+                analyze_measurement,
+                name,
+                input_dict,
+                signal_parameters,
+                output_dir,
+                assets_dir,
+            )
+            for name, (input_dict, output_dir) in pending.items()
+        ]
+        for future in as_completed(futures):
+            name, status, elapsed = future.result()
+            if status != "done":
+                failed += 1
+            print(f"{name}: {status} ({elapsed:.2f} s)")
+    wall_time = time.perf_counter() - start
+
+    analyzed = len(pending) - failed
+    throughput = analyzed / wall_time if wall_time > 0 else 0.0
+    print(
+        f"{len(measurements)} measurements: {analyzed} analyzed, {skipped} skipped, "
+        f"{failed} failed in {wall_time:.2f} s ({throughput:.2f} measurements/s)"
+    )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
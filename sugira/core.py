@@ -1,34 +1,106 @@
 import numpy as np
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from plotly import graph_objects as go
 from engine.input import InputProcessorChain
 from engine.intensity import (
     bformat_to_intensity,
     crop_2d,
+    crop_analysis_window,
+    direct_sound_peak,
+    intensity_decimation_factor,
+    intensity_onset_search,
     integrate_intensity_directions,
+    integrate_intensity_multiresolution,
     reflection_threshold,
 )
 from engine.w_channel_pre import w_preprocess
-from engine.plot import hedgehog, w_channel, setup_plotly_layout
+from engine.plot import (
+    THRESHOLD_SLIDER_SCRIPT,
+    W_CHANNEL_DISPLAY_POINTS,
+    hedgehog,
+    setup_plotly_layout,
+    threshold_slider,
+    w_channel,
+)
 from engine.plot_plan_view import hedgehog_plan_view, setup_plotly_plan_view
+from engine.onset import OnsetStrategy, detect_onset
 from engine.reflections import detect_reflections
-from utils.audio_stack import read_signals
+from utils.audio_stack import input_signature, read_signals
 from utils.formatter import cartesian_to_spherical
 from utils.embed_files import generate_html, generate_plan_view_json
 from utils.export_data import export_data
+from utils.run_context import RunContext
+
+ANALYSIS_STEPS = ("read", "convert", "filter", "integrate", "detect", "render")
+ONSET_METHODS = tuple(strategy.name.lower() for strategy in OnsetStrategy)
+PRECISIONS = ("float64", "float32")
+STAGE_CACHE_SIZE = 32
+
+
+class AnalysisCancelled(Exception):
+    """Raised by a progress callback to stop an analysis between steps."""
+
+
+def freeze(result: Any) -> Any:
+    """Makes the arrays of a stage result read-only, so results shared between
+    analyses can't be modified by any of them."""
+
+    if isinstance(result, np.ndarray):
+        result.setflags(write=False)
+    elif isinstance(result, (tuple, list)):
+        for item in result:
+            freeze(item)
+    elif isinstance(result, dict):
+        for item in result.values():
+            freeze(item)
+
+    return result
+
+
+def notify(progress: Optional[Callable[[str], None]], step: str) -> None:
+    """Reports the analysis step about to start, if a progress callback is set."""
+
+    if progress is not None:
+        progress(step)
 
 
 @dataclass
 class SeaUrchinAnalyzer:
-    """Main class for analyzing Ambisonics impulse responses"""
+    """Main class for analyzing Ambisonics impulse responses.
+
+    The analysis runs as a chain of stages. The results of the last
+    stage_cache_size stage runs are kept, keyed by the stage and the
+    parameters it depends on, so a new analysis only recomputes the stages
+    whose parameters changed.
 
-    input_builder = InputProcessorChain()
+    The analyzer never modifies its inputs and stored stage results are
+    read-only, so one instance can run several analyses at once from
+    different threads. Analyses of different measurements keep their own
+    results, and a stage needed by several of them at once is computed once.
+    """
+
+    input_builder: InputProcessorChain = field(
+        default_factory=InputProcessorChain, repr=False
+    )
+    stage_cache_size: int = STAGE_CACHE_SIZE
+    stage_cache: "OrderedDict[Tuple[str, tuple], Future]" = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    stage_lock: Lock = field(default_factory=Lock, init=False, repr=False)
 
     def analyze(
         self,
         input_dict: dict,
         signal_parameters: dict,
         show: bool = False,
+        progress: Optional[Callable[[str], None]] = None,
+        run_context: Optional[RunContext] = None,
+        save_html: bool = True,
     ) -> go.Figure:
         """Analyzes a set of measurements in Ambisonics format and plots a hedgehog
         with the estimated reflections direction.
@@ -41,8 +113,22 @@ class SeaUrchinAnalyzer:
         signal_parameters : dict
             Dictionary with signal parameters loaded by the user in the main window
             (analysis length, integration window, threshold and frequency correction).
+            An optional "precision" entry, one of PRECISIONS, sets the data type
+            the signals are read and processed in. With "float32" only the
+            capsule correction, the low-pass filter, the integrated intensity
+            and the W channel smoothing run in double precision.
         show : bool, optional
             Shows plotly figure in browser, by default False.
+        progress : Optional[Callable[[str], None]], optional
+            Called with each of ANALYSIS_STEPS before it starts. It may raise
+            AnalysisCancelled to stop the analysis, by default None.
+        run_context : Optional[RunContext], optional
+            Where the outputs of this analysis are written. If None, they are
+            written to the current working directory, which concurrent
+            analyses must not share, by default None.
+        save_html : bool, optional
+            Writes the figure as .html to the run directory. Callers that show
+            the figure from memory can skip it, by default True.
 
         Returns
         -------
@@ -50,33 +136,33 @@ class SeaUrchinAnalyzer:
             Plotly figure with hedgehog and w-channel plot
         """
 
-        input_data_dict, signals_paths = read_signals(input_dict)
-        sample_rate = input_data_dict["sample_rate"]
-
-        bformat_signals = np.vstack(self.input_builder.process(input_data_dict))
+        if run_context is None:
+            run_context = RunContext.create(Path.cwd())
 
-        intensity_directions = bformat_to_intensity(
-            bformat_signals, sample_rate, signal_parameters["low_pass_key"]
+        notify(progress, "read")
+        _, _, _, signals_paths = self.bformat_stage(
+            input_dict, signal_parameters, progress
         )
 
-        intensity_directions_cropped = crop_2d(
-            signal_parameters["analysis_length"], sample_rate, intensity_directions
-        )
-
-        intensity_windowed, time = integrate_intensity_directions(
-            intensity_directions_cropped,
-            signal_parameters["integration_time"],
-            sample_rate,
-        )
-
-        intensity, azimuth, elevation = cartesian_to_spherical(intensity_windowed)
+        notify(progress, "filter")
+        self.intensity_stage(input_dict, signal_parameters)
 
+        notify(progress, "integrate")
         (
+            time,
+            azimuth,
+            elevation,
             intensity_peaks,
             azimuth_peaks,
             elevation_peaks,
             reflections_idx,
-        ) = detect_reflections(intensity, azimuth, elevation)
+        ) = self.reflections_stage(input_dict, signal_parameters, progress)
+
+        # Every peak is kept in the figure, so the threshold can be changed there
+        all_peaks = reflection_threshold(
+            -np.inf, intensity_peaks, azimuth_peaks, elevation_peaks, reflections_idx
+        )
+        all_peaks_time = time[all_peaks[3]] * 1000
 
         (
             reflex_to_direct,
@@ -93,6 +179,7 @@ class SeaUrchinAnalyzer:
 
         time = time[reflections_idx]
 
+        notify(progress, "render")
         fig = setup_plotly_layout()
         hedgehog(
             fig,
@@ -103,16 +190,11 @@ class SeaUrchinAnalyzer:
             signal_parameters,
             signals_paths,
         )
+        threshold_slider(fig, all_peaks_time, *all_peaks[:3], signal_parameters)
 
         # Energy or Amplitude
-        time_w_channel = (
-            np.arange(0, signal_parameters["analysis_length"], 1 / sample_rate) * 1000
-        )
-        w_channel_signal, w_energy = w_preprocess(
-            bformat_signals[0, :],
-            int(signal_parameters["integration_time"] * sample_rate),
-            signal_parameters["analysis_length"],
-            sample_rate,
+        time_w_channel, w_channel_signal, w_energy = self.w_channel_stage(
+            input_dict, signal_parameters
         )
 
         if signal_parameters["plot_energy"] is True:
@@ -126,6 +208,7 @@ class SeaUrchinAnalyzer:
                 title_xaxis,
                 signal_parameters["intensity_threshold"],
                 time,
+                signal_parameters.get("display_points", W_CHANNEL_DISPLAY_POINTS),
             )
         else:
             yaxis = [0, 1]
@@ -138,24 +221,356 @@ class SeaUrchinAnalyzer:
                 title_xaxis,
                 signal_parameters["intensity_threshold"],
                 time,
+                signal_parameters.get("display_points", W_CHANNEL_DISPLAY_POINTS),
             )
 
         export_data(
-            time, time_w_channel, w_channel_signal, reflex_to_direct, azimuth, elevation
+            time,
+            time_w_channel,
+            w_channel_signal,
+            reflex_to_direct,
+            azimuth,
+            elevation,
+            run_context.output_dir,
+            signal_parameters.get("export_formats", ("txt",)),
         )
 
-        generate_html(fig)
+        if save_html:
+            generate_html(
+                fig,
+                run_context.html_path,
+                run_context.assets_dir,
+                post_script=THRESHOLD_SLIDER_SCRIPT,
+            )
 
         # .Json for plan view plot
         fig_plan_view = setup_plotly_plan_view()
         hedgehog_plan_view(
             fig_plan_view, time, reflex_to_direct, azimuth_peaks, elevation_peaks
         )
-        generate_plan_view_json(fig_plan_view)
+        generate_plan_view_json(fig_plan_view, run_context.plan_view_json_path)
 
         if show:
             fig.show(
-                post_script=["""document.body.style.backgroundColor = "#1f1b24"; """]
+                post_script=[
+                    """document.body.style.backgroundColor = "#1f1b24"; """,
+                    THRESHOLD_SLIDER_SCRIPT,
+                ]
             )
 
         return fig
+
+    def integrate_resolutions(
+        self,
+        input_dict: dict,
+        signal_parameters: dict,
+        integration_times: List[float],
+    ) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+        """Integrates the intensity of a set of measurements for several integration
+        windows, reading, converting and cropping the signals only once.
+
+        Parameters
+        ----------
+        input_dict : dict
+            Dictionary with all the data needed to analyze a set of measurements
+            (paths of the measurements, input mode and channels per file).
+        signal_parameters : dict
+            Dictionary with signal parameters loaded by the user in the main window
+            (analysis length and frequency correction).
+        integration_times : List[float]
+            Integration windows in seconds.
+
+        Returns
+        -------
+        Dict[float, Tuple[np.ndarray, np.ndarray]]
+            Integrated intensities and their time, keyed by integration window.
+        """
+
+        intensity_directions_cropped, intensity_rate, direct_sound_idx = (
+            self.intensity_stage(input_dict, signal_parameters)
+        )
+
+        return integrate_intensity_multiresolution(
+            intensity_directions_cropped,
+            integration_times,
+            intensity_rate,
+            direct_sound_idx,
+        )
+
+    def memoize(self, stage: str, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Returns the stored result of a stage if it was computed with the same
+        key, otherwise computes and stores it.
+
+        The result is computed outside the lock, so concurrent analyses with
+        different keys don't wait for each other. Analyses that need a result
+        being computed wait for it instead of computing it again. If the
+        computation fails, it is dropped and the waiting analyses compute it
+        themselves.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+        key : tuple
+            Everything the stage result depends on.
+        compute : Callable[[], Any]
+            Function that computes the stage result.
+
+        Returns
+        -------
+        Any
+            Result of the stage.
+        """
+
+        cache_key = (stage, key)
+        while True:
+            with self.stage_lock:
+                future = self.stage_cache.get(cache_key)
+                if future is None:
+                    future = Future()
+                    self.stage_cache[cache_key] = future
+                    while len(self.stage_cache) > self.stage_cache_size:
+                        self.stage_cache.popitem(last=False)
+                    break
+                self.stage_cache.move_to_end(cache_key)
+
+            try:
+                return future.result()
+            except Exception:  # pylint: disable=broad-except
+                # Failed in another analysis, which raised it
+                continue
+
+        try:
+            result = freeze(compute())
+        except BaseException as error:
+            with self.stage_lock:
+                if self.stage_cache.get(cache_key) is future:
+                    del self.stage_cache[cache_key]
+            future.set_exception(error)
+            raise
+        future.set_result(result)
+
+        return result
+
+    def bformat_key(self, input_dict: dict, signal_parameters: dict) -> tuple:
+        """Key of the B-format stage: the measurements, the precision they are
+        read with, and the analysis length and direct sound detection the
+        signals are cropped with."""
+
+        return (
+            input_signature(input_dict),
+            signal_parameters.get("precision", "float64"),
+            signal_parameters["analysis_length"],
+            signal_parameters.get("onset_method", "peak"),
+        )
+
+    def bformat_stage(
+        self,
+        input_dict: dict,
+        signal_parameters: dict,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[np.ndarray, int, float, dict]:
+        """Reads the measurements, converts them to corrected B-format signals and
+        crops them to the analysis window.
+
+        Only the cropped window is kept, so every later stage works on, and the
+        cache holds, signals that scale with the analysis length rather than
+        with the length of the recordings.
+
+        Returns
+        -------
+        Tuple[np.ndarray, int, float, dict]
+            Cropped B-format signals, index of the direct sound in them, sample
+            rate and paths of the signals read.
+        """
+
+        def compute():
+            input_data_dict, signals_paths = read_signals(
+                input_dict, signal_parameters.get("precision", "float64")
+            )
+            input_data_dict = {
+                **input_data_dict,
+                "deconvolution_length": signal_parameters["analysis_length"],
+            }
+            notify(progress, "convert")
+            bformat_dict = self.input_builder.convert(input_data_dict)
+            sample_rate = input_data_dict["sample_rate"]
+
+            # The capsule correction has poles on the unit circle, so its W
+            # channel keeps ringing after full-band arrivals and can peak
+            # anywhere: the direct sound is detected before it
+            direct_sound_idx = detect_onset(
+                np.asarray(bformat_dict["stacked_signals"][0]),
+                sample_rate,
+                OnsetStrategy[signal_parameters.get("onset_method", "peak").upper()],
+            )
+            bformat_signals = np.vstack(self.input_builder.correct(bformat_dict))
+
+            bformat_window, direct_sound_idx = crop_analysis_window(
+                bformat_signals,
+                direct_sound_idx,
+                signal_parameters["analysis_length"],
+                sample_rate,
+            )
+
+            # A copy, so the full length signals are released
+            return bformat_window.copy(), direct_sound_idx, sample_rate, signals_paths
+
+        return self.memoize(
+            "bformat", self.bformat_key(input_dict, signal_parameters), compute
+        )
+
+    def intensity_stage(
+        self, input_dict: dict, signal_parameters: dict
+    ) -> Tuple[np.ndarray, float, int]:
+        """Computes the intensity directions, cropped to the analysis length.
+
+        With the peak onset the crop starts at the intensity peak of the
+        direct sound, searched around the W channel peak, as the filter moves
+        it. Any other onset marks where the direct sound starts, so the crop
+        starts right at it, like the W channel, and the direct sound is the
+        intensity peak after it.
+
+        Returns
+        -------
+        Tuple[np.ndarray, float, int]
+            Cropped intensity directions, their sample rate and the index of
+            the direct sound in them.
+        """
+
+        def compute():
+            bformat_signals, direct_sound_idx, sample_rate, _ = self.bformat_stage(
+                input_dict, signal_parameters
+            )
+
+            decimation = intensity_decimation_factor(
+                sample_rate, signal_parameters["low_pass_key"]
+            )
+            intensity_rate = sample_rate / decimation
+            intensity_directions = bformat_to_intensity(
+                bformat_signals,
+                sample_rate,
+                signal_parameters["low_pass_key"],
+                decimation,
+            )
+
+            # The direct sound found in the W channel, through the filter delay
+            intensity_onset_idx, search_radius = intensity_onset_search(
+                direct_sound_idx,
+                sample_rate,
+                signal_parameters["low_pass_key"],
+                decimation,
+            )
+            onset_strategy = OnsetStrategy[
+                signal_parameters.get("onset_method", "peak").upper()
+            ]
+            if onset_strategy == OnsetStrategy.PEAK:
+                intensity_directions_cropped = crop_2d(
+                    signal_parameters["analysis_length"],
+                    intensity_rate,
+                    intensity_directions,
+                    intensity_onset_idx,
+                    search_radius,
+                )
+                direct_sound_peak_idx = 0
+            else:
+                intensity_directions_cropped = crop_2d(
+                    signal_parameters["analysis_length"],
+                    intensity_rate,
+                    intensity_directions,
+                    intensity_onset_idx,
+                )
+                direct_sound_peak_idx = direct_sound_peak(
+                    intensity_directions_cropped, search_radius
+                )
+
+            return intensity_directions_cropped, intensity_rate, direct_sound_peak_idx
+
+        key = (
+            self.bformat_key(input_dict, signal_parameters),
+            signal_parameters["low_pass_key"],
+            signal_parameters["analysis_length"],
+        )
+
+        return self.memoize("intensity", key, compute)
+
+    def reflections_stage(
+        self,
+        input_dict: dict,
+        signal_parameters: dict,
+        progress: Optional[Callable[[str], None]] = None,
+    ) -> tuple:
+        """Integrates the cropped intensity and detects the reflections.
+
+        Returns
+        -------
+        tuple
+            Time of each window, azimuth and elevation of each window, and the
+            intensity, azimuth, elevation and window index of each peak.
+        """
+
+        def compute():
+            intensity_directions_cropped, intensity_rate, direct_sound_idx = (
+                self.intensity_stage(input_dict, signal_parameters)
+            )
+
+            intensity_windowed, time = integrate_intensity_directions(
+                intensity_directions_cropped,
+                signal_parameters["integration_time"],
+                intensity_rate,
+                direct_sound_idx,
+            )
+
+            intensity, azimuth, elevation = cartesian_to_spherical(intensity_windowed)
+
+            notify(progress, "detect")
+            return (time, azimuth, elevation) + detect_reflections(
+                intensity, azimuth, elevation
+            )
+
+        key = (
+            self.bformat_key(input_dict, signal_parameters),
+            signal_parameters["low_pass_key"],
+            signal_parameters["analysis_length"],
+            signal_parameters["integration_time"],
+        )
+
+        return self.memoize("reflections", key, compute)
+
+    def w_channel_stage(
+        self, input_dict: dict, signal_parameters: dict
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Crops and smooths the omnidirectional channel.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            Time in milliseconds, filtered W channel and W channel in decibels.
+        """
+
+        def compute():
+            bformat_signals, direct_sound_idx, sample_rate, _ = self.bformat_stage(
+                input_dict, signal_parameters
+            )
+
+            time_w_channel = (
+                np.arange(0, signal_parameters["analysis_length"], 1 / sample_rate)
+                * 1000
+            )
+            w_channel_signal, w_energy = w_preprocess(
+                bformat_signals[0, :],
+                int(signal_parameters["integration_time"] * sample_rate),
+                signal_parameters["analysis_length"],
+                sample_rate,
+                direct_sound_idx,
+            )
+
+            return time_w_channel, w_channel_signal, w_energy
+
+        key = (
+            self.bformat_key(input_dict, signal_parameters),
+            signal_parameters["analysis_length"],
+            signal_parameters["integration_time"],
+        )
+
+        return self.memoize("w_channel", key, compute)
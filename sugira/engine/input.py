@@ -4,11 +4,13 @@ from enum import Enum
 from abc import ABC, abstractmethod
 
 import numpy as np
-from scipy.signal import fftconvolve
 
-from utils.filters import CapsuleMicsCorrection
+from utils.deconvolution import deconvolve, stream_deconvolve
+from utils.filters import capsule_correction_bank
 from utils.formatter import convert_ambisonics_a_to_b
 
+DECONVOLUTION_MARGIN = 0.1
+
 
 class InputFormat(Enum):
     """Enum class for accessing the existing Input Formats"""
@@ -26,7 +28,9 @@ class InputProcessor(ABC):
         """Abstract method to be overwritten by concrete implementations of
         the input processor.
 
-        Processes the input signals according to the format."""
+        Processes the input signals according to the format. Implementations
+        return a new dictionary and never modify input_dict or its arrays, so
+        one processor can serve several threads at once."""
 
 
 class LSSInputProcessor(InputProcessor):
@@ -35,6 +39,11 @@ class LSSInputProcessor(InputProcessor):
     def process(self, input_dict: dict) -> dict:
         """Reads all measurementes, convolves with IF, obtains new A-format signals array.
 
+        If input_dict has a "deconvolution_length" entry (in seconds), only that
+        length after the direct sound is kept, plus DECONVOLUTION_MARGIN on
+        each side, instead of the full convolution. If "streaming" is set, the
+        signals are paths and the recordings are deconvolved block by block.
+
         Parameters
         ----------
         input_dict : str
@@ -42,20 +51,37 @@ class LSSInputProcessor(InputProcessor):
 
         Returns
         -------
-        input_dict : dict
-            Overwritten input_dict with A-Format signals.
+        dict
+            Copy of input_dict with A-Format signals.
         """
 
         if input_dict["input_mode"] != InputFormat.LSS:
             return input_dict
-        input_dict["stacked_signals"] = np.apply_along_axis(
-            lambda array: fftconvolve(array, input_dict["inverse_filter"], mode="full"),
-            axis=1,
-            arr=input_dict["stacked_signals"],
+
+        keep_length, pre_margin = None, 0
+        if input_dict.get("deconvolution_length") is not None:
+            sample_rate = input_dict["sample_rate"]
+            pre_margin = int(DECONVOLUTION_MARGIN * sample_rate)
+            keep_length = (
+                int(input_dict["deconvolution_length"] * sample_rate) + pre_margin
+            )
+
+        if input_dict.get("streaming"):
+            deconvolution = stream_deconvolve
+        else:
+            deconvolution = deconvolve
+        stacked_signals = deconvolution(
+            input_dict["stacked_signals"],
+            input_dict["inverse_filter"],
+            keep_length,
+            pre_margin,
         )
-        input_dict["input_mode"] = InputFormat.AFORMAT
 
-        return input_dict
+        return {
+            **input_dict,
+            "stacked_signals": stacked_signals,
+            "input_mode": InputFormat.AFORMAT,
+        }
 
 
 class AFormatProcessor(InputProcessor):
@@ -65,6 +91,10 @@ class AFormatProcessor(InputProcessor):
         """
         Converts the signals from format a into b.
 
+        An "encoding_matrix" entry (4 rows, one column per capsule) replaces
+        the tetrahedral encoding, and a "capsule_gains" entry trims the gain
+        of each capsule.
+
         Parameters
         ----------
         input_dict : dict
@@ -72,22 +102,23 @@ class AFormatProcessor(InputProcessor):
 
         Returns
         -------
-        input_dict : dict
-            Signals converted into B-Format.
+        dict
+            Copy of input_dict with signals converted into B-Format.
         """
 
         if input_dict["input_mode"] != InputFormat.AFORMAT:
             return input_dict
-        input_dict["stacked_signals"] = np.vstack(input_dict["stacked_signals"])
-        input_dict["stacked_signals"] = convert_ambisonics_a_to_b(
-            input_dict["stacked_signals"][0, :],
-            input_dict["stacked_signals"][1, :],
-            input_dict["stacked_signals"][2, :],
-            input_dict["stacked_signals"][3, :],
+        stacked_signals = convert_ambisonics_a_to_b(
+            input_dict["stacked_signals"],
+            matrix=input_dict.get("encoding_matrix"),
+            capsule_gains=input_dict.get("capsule_gains"),
         )
-        input_dict["input_mode"] = InputFormat.BFORMAT
 
-        return input_dict
+        return {
+            **input_dict,
+            "stacked_signals": stacked_signals,
+            "input_mode": InputFormat.BFORMAT,
+        }
 
 
 class BFormatProcessor(InputProcessor):
@@ -103,22 +134,34 @@ class BFormatProcessor(InputProcessor):
         elif input_dict["input_mode"] == InputFormat.BFORMAT and not bool(input_dict["frequency_correction"]):
             return input_dict
         elif input_dict["input_mode"] == InputFormat.BFORMAT and bool(input_dict["frequency_correction"]):         
-            mic_corrector = CapsuleMicsCorrection(input_dict["sample_rate"])
-            input_dict["stacked_signals"] = np.vstack(input_dict["stacked_signals"])
-            input_dict["stacked_signals"][0, :] = mic_corrector.omni_correction(input_dict["stacked_signals"][0, :])
-            input_dict["stacked_signals"][1:, :] = mic_corrector.axis_correction(input_dict["stacked_signals"][1:, :])
-            input_dict["input_mode"] = InputFormat.BFORMAT            
-            return input_dict
+            filter_bank = capsule_correction_bank(input_dict["sample_rate"])
+            # The bank writes a new array, so the caller's (possibly cached)
+            # signals stay untouched
+            stacked_signals = filter_bank.process(
+                np.asarray(input_dict["stacked_signals"])
+            )
+            return {**input_dict, "stacked_signals": stacked_signals}
 
         return input_dict
 
 
 class InputProcessorChain:
+    """Stateless chain of input processors, safe to share between threads."""
+
     def __init__(self):
-        self.processors = [LSSInputProcessor(), AFormatProcessor(), BFormatProcessor()]
+        self.converters = [LSSInputProcessor(), AFormatProcessor()]
+        self.corrector = BFormatProcessor()
 
-    def process(self, input_dict: dict) -> dict:
-        for processor in self.processors:
+    def convert(self, input_dict: dict) -> dict:
+        """Converts the measurements to B-format, without the capsule correction."""
+        for processor in self.converters:
             input_dict = processor.process(input_dict)
 
-        return input_dict["stacked_signals"]
+        return input_dict
+
+    def correct(self, input_dict: dict) -> np.ndarray:
+        """Applies the capsule correction to converted B-format signals."""
+        return self.corrector.process(input_dict)["stacked_signals"]
+
+    def process(self, input_dict: dict) -> np.ndarray:
+        return self.correct(self.convert(input_dict))
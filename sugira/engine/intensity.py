@@ -1,10 +1,18 @@
 """Intensity computation"""
 
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import irfft, next_fast_len, rfft
 
-from utils.filters import low_pass_filter
+from engine.onset import DIRECT_SOUND_LENGTH
+from utils.filters import (
+    decimation_factor,
+    low_pass_coefficients,
+    low_pass_decimate,
+    low_pass_filter,
+)
 
 FILTER_CUTOFF = 500
 OVERLAP_RATIO = 0.5
@@ -14,6 +22,7 @@ def crop_1d(
     array: np.ndarray,
     analysis_length: float,
     sample_rate: int,
+    onset_idx: Optional[int] = None,
 ) -> np.ndarray:
     """
     Crops a 1D array based on the analysis length.
@@ -26,6 +35,9 @@ def crop_1d(
         Analysis length in seconds.
     sample_rate : int
         Sample rate in Hz.
+    onset_idx : Optional[int], optional
+        Index where the crop starts. If None, the crop starts at the peak of
+        the array, by default None.
 
     Returns
     -------
@@ -34,7 +46,10 @@ def crop_1d(
     """
 
     analysis_length_idx = int(analysis_length * sample_rate)
-    earliest_peak_idx = np.argmax(np.abs(array))
+    if onset_idx is None:
+        earliest_peak_idx = np.argmax(np.abs(array))
+    else:
+        earliest_peak_idx = onset_idx
     array_cropped = array[earliest_peak_idx : earliest_peak_idx + analysis_length_idx]
 
     return array_cropped
@@ -44,6 +59,8 @@ def crop_2d(
     analysis_length: float,
     sample_rate: int,
     intensity_direction: np.ndarray,
+    onset_idx: Optional[int] = None,
+    search_radius: int = 0,
 ) -> np.ndarray:
     """
     Crops a 2D array based on the analysis length.
@@ -56,6 +73,12 @@ def crop_2d(
         Sample rate in Hz.
     intensity_direction : np.ndarray
         Array of intensities in different directions.
+    onset_idx : Optional[int], optional
+        Expected index of the direct sound. The crop starts at the earliest of
+        the peaks of every direction, searched within search_radius of it. If
+        None, the peaks are searched over the whole array, by default None.
+    search_radius : int, optional
+        Samples searched on each side of onset_idx, by default 0.
 
     Returns
     -------
@@ -64,7 +87,17 @@ def crop_2d(
     """
 
     analysis_length_idx = int(analysis_length * sample_rate)
-    earliest_peak_idx = np.argmax(np.abs(intensity_direction), axis=1).min()
+    search_start = 0
+    if onset_idx is not None:
+        search_start = max(0, onset_idx - search_radius)
+        intensity_direction_searched = intensity_direction[
+            :, search_start : onset_idx + search_radius + 1
+        ]
+    else:
+        intensity_direction_searched = intensity_direction
+    earliest_peak_idx = (
+        search_start + np.argmax(np.abs(intensity_direction_searched), axis=1).min()
+    )
     intensity_directions_cropped = intensity_direction[
         :, earliest_peak_idx : earliest_peak_idx + analysis_length_idx
     ]
@@ -72,8 +105,152 @@ def crop_2d(
     return intensity_directions_cropped
 
 
+def crop_analysis_window(
+    bformat_signals: np.ndarray,
+    direct_sound_idx: int,
+    analysis_length: float,
+    sample_rate: int,
+) -> Tuple[np.ndarray, int]:
+    """
+    Crops the B-format signals to the analysis window before any filtering.
+
+    The window keeps analysis_length seconds after the direct sound plus the
+    length of the frequency correction filter on both sides, so the filter
+    settles before the direct sound and its delayed output still covers the
+    whole analysis length. The window starts at a multiple of the decimation
+    factor, so the decimated intensity keeps the samples it would have had
+    without cropping.
+
+    Parameters
+    ----------
+    bformat_signals : np.ndarray
+        B-format signals with shape (4, samples), W channel first.
+    direct_sound_idx : int
+        Index of the direct sound in the signals.
+    analysis_length : float
+        Analysis length in seconds.
+    sample_rate : int
+        Sample rate in Hz.
+
+    Returns
+    -------
+    Tuple[np.ndarray, int]
+        View of the signals in the analysis window and index of the direct
+        sound in it.
+    """
+
+    margin = len(low_pass_coefficients(FILTER_CUTOFF, sample_rate))
+    decimation = intensity_decimation_factor(sample_rate, True)
+
+    start = max(0, direct_sound_idx - margin) // decimation * decimation
+    stop = direct_sound_idx + int(analysis_length * sample_rate) + margin
+
+    return bformat_signals[:, start:stop], direct_sound_idx - start
+
+
+def intensity_onset_search(
+    onset_idx: int,
+    sample_rate: int,
+    frequency_correction: bool,
+    decimation: int = 1,
+) -> Tuple[int, int]:
+    """
+    Translates the index of the direct sound in the B-format signals to the
+    intensity computed by bformat_to_intensity from them.
+
+    The frequency correction filter is linear phase, so it delays the
+    intensity by half its length, and the decimation divides the index. The
+    filter also spreads the direct sound over its length, so the peak of the
+    intensity can move up to half the filter length from the delayed onset.
+
+    Parameters
+    ----------
+    onset_idx : int
+        Index of the direct sound in the B-format signals.
+    sample_rate : int
+        Sample rate in Hz of the B-format signals.
+    frequency_correction : bool
+        Indicates whether the frequency correction filter is applied.
+    decimation : int, optional
+        Downsampling factor of the intensity, by default 1.
+
+    Returns
+    -------
+    Tuple[int, int]
+        Expected index of the direct sound in the intensity and the samples
+        around it where its peak is searched.
+    """
+
+    group_delay = 0
+    if frequency_correction == True:
+        group_delay = (len(low_pass_coefficients(FILTER_CUTOFF, sample_rate)) - 1) / 2
+
+    intensity_onset_idx = int(np.round((onset_idx + group_delay) / decimation))
+    search_radius = int(
+        np.ceil((group_delay + DIRECT_SOUND_LENGTH * sample_rate) / decimation)
+    )
+
+    return intensity_onset_idx, search_radius
+
+
+def direct_sound_peak(intensity_directions: np.ndarray, search_radius: int) -> int:
+    """
+    Finds the peak of the direct sound in intensity cropped at its onset.
+
+    An onset other than the peak of the W channel marks where the direct
+    sound starts, so every stage starts there, but its intensity peaks later.
+    The peak is the loudest sample within search_radius of the start.
+
+    Parameters
+    ----------
+    intensity_directions : np.ndarray
+        Intensity directions cropped at the onset of the direct sound.
+    search_radius : int
+        Samples searched after the onset.
+
+    Returns
+    -------
+    int
+        Index of the direct sound peak in intensity_directions.
+    """
+
+    intensity_directions = select_intensity_axes(intensity_directions)
+    intensity_energy = np.sum(
+        np.square(intensity_directions[:, : search_radius + 1], dtype=np.float64),
+        axis=0,
+    )
+
+    return int(np.argmax(intensity_energy))
+
+
+def intensity_decimation_factor(sample_rate: float, frequency_correction: bool) -> int:
+    """
+    Computes the decimation factor applied by bformat_to_intensity.
+
+    Parameters
+    ----------
+    sample_rate : float
+        Sample rate in Hz.
+    frequency_correction : bool
+        Indicates whether to apply frequency correction.
+
+    Returns
+    -------
+    int
+        Decimation factor. The intensity is sampled at sample_rate / factor.
+    """
+
+    if frequency_correction == True:
+        return decimation_factor(FILTER_CUTOFF, sample_rate)
+
+    return 1
+
+
 def bformat_to_intensity(
-    signal: np.ndarray, sample_rate: float, frequency_correction: bool
+    signal: np.ndarray,
+    sample_rate: float,
+    frequency_correction: bool,
+    decimation: int = 1,
 ) -> Tuple[np.ndarray]:
     """
     Converts a B-format signal to directional intensity.
@@ -86,6 +263,9 @@ def bformat_to_intensity(
         Sample rate in Hz.
     frequency_correction : bool
         Indicates whether to apply frequency correction.
+    decimation : int, optional
+        Downsampling factor applied together with the frequency correction
+        filter, by default 1.
 
     Returns
     -------
@@ -93,7 +273,11 @@ def bformat_to_intensity(
         Calculated directional intensities.
     """
 
-    if frequency_correction == True:
+    if frequency_correction == True and decimation > 1:
+        signal_filtered = low_pass_decimate(
+            signal, FILTER_CUTOFF, sample_rate, decimation
+        )
+    elif frequency_correction == True:
         signal_filtered = low_pass_filter(signal, FILTER_CUTOFF, sample_rate)
     else:
         signal_filtered = signal
@@ -178,10 +362,65 @@ def min_max_normalization(array: np.ndarray) -> np.ndarray:
     return (array - array.min() * 1.1) / (array.max() - array.min() * 1.1)
 
 
+def select_intensity_axes(intensity_directions: np.ndarray) -> np.ndarray:
+    """
+    Keeps the X, Y and Z rows of an intensity array.
+
+    Parameters
+    ----------
+    intensity_directions : np.ndarray
+        Intensity directions with 3 rows, or 4 rows if the W row is included.
+
+    Returns
+    -------
+    np.ndarray
+        Intensity directions with shape (3, samples).
+    """
+
+    if intensity_directions.shape[0] == 4:
+        intensity_directions = intensity_directions[1:, :]
+    elif (intensity_directions.shape[0] < 3) or (intensity_directions.shape[0] > 4):
+        raise ValueError(f"Incorrect input shape {intensity_directions.shape}")
+
+    return intensity_directions
+
+
+def frame_signal(
+    array: np.ndarray,
+    frame_size: int,
+    hop_size: int,
+    frames_count: int,
+) -> np.ndarray:
+    """
+    Builds overlapping frames of every row of a 2D array as a strided view.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        Input array with shape (channels, samples).
+    frame_size : int
+        Length of each frame in samples.
+    hop_size : int
+        Distance between the start of consecutive frames in samples.
+    frames_count : int
+        Number of frames to build.
+
+    Returns
+    -------
+    np.ndarray
+        Read-only view with shape (channels, frames_count, frame_size).
+    """
+
+    frames = sliding_window_view(array, frame_size, axis=1)[:, ::hop_size]
+
+    return frames[:, :frames_count]
+
+
 def integrate_intensity_directions(
     intensity_directions: np.ndarray,
     duration_secs: float,
     sample_rate: int,
+    direct_sound_idx: int = 0,
 ) -> np.ndarray:
     """
     Integrates intensity directions over time windows.
@@ -194,6 +433,9 @@ def integrate_intensity_directions(
         Duration of each window in seconds.
     sample_rate : int
         Sample rate in Hz.
+    direct_sound_idx : int, optional
+        Index of the direct sound sample, inserted with no window before the
+        windows, by default 0.
 
     Returns
     -------
@@ -201,10 +443,7 @@ def integrate_intensity_directions(
         Integrated intensities per window and the corresponding time.
     """
 
-    if intensity_directions.shape[0] == 4:
-        intensity_directions = intensity_directions[1:, :]
-    elif (intensity_directions.shape[0] < 3) or (intensity_directions.shape[0] > 4):
-        raise ValueError(f"Incorrect input shape {intensity_directions.shape}")
+    intensity_directions = select_intensity_axes(intensity_directions)
 
     # Convert integration time to samples
     duration_samples = np.round(duration_secs * sample_rate).astype(np.int64)
@@ -212,27 +451,108 @@ def integrate_intensity_directions(
     # Padding and Windowing
     hop_size = int(duration_samples * (1 - OVERLAP_RATIO))
     intensity_directions = np.concatenate(
-        [intensity_directions, np.zeros((3, intensity_directions.shape[1] % hop_size))],
+        [
+            intensity_directions,
+            np.zeros(
+                (3, intensity_directions.shape[1] % hop_size),
+                dtype=intensity_directions.dtype,
+            ),
+        ],
         axis=1,
     )
-    output_shape = (
-        3,
-        int(intensity_directions.shape[1] / duration_samples / OVERLAP_RATIO) - 1,
+    frames_count = (
+        int(intensity_directions.shape[1] / duration_samples / OVERLAP_RATIO) - 1
     )
-    intensity_windowed = np.zeros(output_shape)
-    time = np.zeros(output_shape[1])
+    # A double precision window makes the product accumulate in double
+    # precision, as levels and angles are computed from the windows
     window = np.hamming(duration_samples)
 
-    for i in range(0, output_shape[1]):
-        intensity_segment = intensity_directions[
-            :, i * hop_size : i * hop_size + duration_samples
-        ]
-        intensity_windowed[:, i] = np.mean(intensity_segment * window, axis=1)
-        time[i] = i * hop_size / sample_rate
+    intensity_frames = frame_signal(
+        intensity_directions, duration_samples, hop_size, frames_count
+    )
+    intensity_windowed = intensity_frames @ window / duration_samples
+    time = np.arange(frames_count) * hop_size / sample_rate
 
     # Add direct sound with no window
     intensity_windowed = np.insert(
-        intensity_windowed, 0, intensity_directions[:, 0], axis=1
+        intensity_windowed, 0, intensity_directions[:, direct_sound_idx], axis=1
     )
 
     return intensity_windowed, time
+
+
+def integrate_intensity_multiresolution(
+    intensity_directions: np.ndarray,
+    durations_secs: List[float],
+    sample_rate: int,
+    direct_sound_idx: int = 0,
+) -> Dict[float, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Integrates intensity directions for several window lengths at once.
+
+    The spectrum of the intensity directions is computed once and every
+    resolution is obtained by correlating it with its own Hamming window, so
+    sweeping N window lengths costs one forward FFT and N inverse FFTs.
+
+    Parameters
+    ----------
+    intensity_directions : np.ndarray
+        Input intensity directions.
+    durations_secs : List[float]
+        Durations of the integration windows in seconds.
+    sample_rate : int
+        Sample rate in Hz.
+    direct_sound_idx : int, optional
+        Index of the direct sound sample, inserted with no window before the
+        windows, by default 0.
+
+    Returns
+    -------
+    Dict[float, Tuple[np.ndarray, np.ndarray]]
+        Integrated intensities per window and the corresponding time, keyed by
+        window duration. Each entry matches integrate_intensity_directions.
+    """
+
+    intensity_directions = select_intensity_axes(intensity_directions)
+    signal_length = intensity_directions.shape[1]
+
+    durations_samples = {
+        duration_secs: int(np.round(duration_secs * sample_rate))
+        for duration_secs in durations_secs
+    }
+    fft_length = next_fast_len(
+        signal_length + 2 * max(durations_samples.values()), real=True
+    )
+    # Correlated in double precision, as levels and angles are computed from it
+    intensity_spectrum = rfft(
+        intensity_directions.astype(np.float64, copy=False), fft_length, axis=1
+    )
+
+    intensity_resolutions = {}
+    for duration_secs, duration_samples in durations_samples.items():
+        hop_size = int(duration_samples * (1 - OVERLAP_RATIO))
+        padded_length = signal_length + signal_length % hop_size
+        frames_count = int(padded_length / duration_samples / OVERLAP_RATIO) - 1
+
+        window = np.hamming(duration_samples)
+        correlation = irfft(
+            intensity_spectrum * rfft(window[::-1], fft_length), fft_length, axis=1
+        )
+        frames_start = duration_samples - 1
+        intensity_windowed = (
+            correlation[
+                :, frames_start : frames_start + frames_count * hop_size : hop_size
+            ]
+            / duration_samples
+        )
+        time = np.arange(frames_count) * hop_size / sample_rate
+
+        # Add direct sound with no window
+        intensity_resolutions[duration_secs] = (
+            np.insert(
+                intensity_windowed, 0, intensity_directions[:, direct_sound_idx], axis=1
+            ),
+            time,
+        )
+
+    return intensity_resolutions
@@ -0,0 +1,146 @@
+"""Definition of methods for detecting the direct sound of a room impulse response."""
+
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Union
+
+import numpy as np
+from scipy.signal import oaconvolve
+
+ONSET_THRESHOLD_DB = -20
+DIRECT_SOUND_LENGTH = 1e-3
+
+
+# pylint: disable=too-few-public-methods
+class OnsetDetection(ABC):
+    """Base interface for a direct sound onset detection algorithm."""
+
+    @staticmethod
+    @abstractmethod
+    def get_index_of_onset(w_channel: np.ndarray, sample_rate: int) -> int:
+        """Abstract method to be overwritten by concrete implementations of
+        onset detection."""
+
+
+# pylint: disable=too-few-public-methods
+class PeakOnset(OnsetDetection):
+    """Algorithm placing the direct sound at the absolute peak of the W channel."""
+
+    @staticmethod
+    def get_index_of_onset(w_channel: np.ndarray, sample_rate: int) -> int:
+        """
+        Finds the absolute peak of the W channel.
+
+        Parameters
+        ----------
+        w_channel : np.ndarray
+            W channel signal.
+        sample_rate : int
+            Sample rate in Hz.
+
+        Returns
+        -------
+        int
+            Index of the direct sound.
+        """
+
+        return int(np.argmax(np.abs(w_channel)))
+
+
+# pylint: disable=too-few-public-methods
+class ThresholdOnset(OnsetDetection):
+    """Algorithm placing the direct sound where the W channel first rises to
+    ONSET_THRESHOLD_DB below its peak, as the start of an impulse response is
+    defined in ISO 3382-1."""
+
+    @staticmethod
+    def get_index_of_onset(w_channel: np.ndarray, sample_rate: int) -> int:
+        """
+        Finds the first sample of the W channel above the onset threshold.
+
+        Parameters
+        ----------
+        w_channel : np.ndarray
+            W channel signal.
+        sample_rate : int
+            Sample rate in Hz.
+
+        Returns
+        -------
+        int
+            Index of the direct sound.
+        """
+
+        w_magnitude = np.abs(w_channel)
+        threshold = np.max(w_magnitude) * 10 ** (ONSET_THRESHOLD_DB / 20)
+
+        return int(np.argmax(w_magnitude >= threshold))
+
+
+# pylint: disable=too-few-public-methods
+class MatchedOnset(OnsetDetection):
+    """Algorithm placing the direct sound at the peak of the W channel energy
+    filtered with a Hann pulse of DIRECT_SOUND_LENGTH, so a single noisy sample
+    can't be taken for the direct sound."""
+
+    @staticmethod
+    def get_index_of_onset(w_channel: np.ndarray, sample_rate: int) -> int:
+        """
+        Finds the peak of the W channel energy correlated with the direct sound
+        pulse.
+
+        Parameters
+        ----------
+        w_channel : np.ndarray
+            W channel signal.
+        sample_rate : int
+            Sample rate in Hz.
+
+        Returns
+        -------
+        int
+            Index of the direct sound.
+        """
+
+        pulse = np.hanning(max(3, int(DIRECT_SOUND_LENGTH * sample_rate)))
+        w_energy = np.square(w_channel, dtype=np.float64)
+
+        # The pulse is symmetric, so correlating is convolving with it
+        return int(np.argmax(oaconvolve(w_energy, pulse, mode="same")))
+
+
+class OnsetStrategy(Enum):
+    """Enum class for accessing the existing Onset Detection Strategies"""
+
+    PEAK = PeakOnset
+    THRESHOLD = ThresholdOnset
+    MATCHED = MatchedOnset
+
+
+def detect_onset(
+    w_channel: np.ndarray,
+    sample_rate: int,
+    strategy_selected: Union[OnsetDetection, OnsetStrategy] = OnsetStrategy.PEAK,
+) -> int:
+    """
+    Detects the direct sound of a measurement in its W channel.
+
+    Parameters
+    ----------
+    w_channel : np.ndarray
+        W channel signal.
+    sample_rate : int
+        Sample rate in Hz.
+    strategy_selected : Union[OnsetDetection, OnsetStrategy], optional
+        Onset detection algorithm, by default OnsetStrategy.PEAK.
+
+    Returns
+    -------
+    int
+        Index of the direct sound.
+    """
+
+    if isinstance(strategy_selected, OnsetStrategy):
+        strategy_selected = strategy_selected.value
+
+    return strategy_selected.get_index_of_onset(w_channel, sample_rate)
@@ -1,13 +1,132 @@
 """Plotting functions."""
 
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from pathlib import Path
+from utils.downsample import lttb
 from utils.formatter import spherical_to_cartesian
 from engine.intensity import min_max_normalization
 
+THRESHOLD_STEP_DB = 1
+W_CHANNEL_DISPLAY_POINTS = 4000
+# Traces with more points than this are drawn with WebGL
+SCATTERGL_MIN_POINTS = 10000
+
+# Filters the peaks stored in layout.meta when the threshold slider moves. It
+# mirrors reflection_threshold and hedgehog, so the plot matches a new analysis
+# with the selected threshold.
+THRESHOLD_SLIDER_SCRIPT = """
+var plot = document.getElementById("{plot_id}");
+var meta = plot.layout.meta;
+
+function normalize(values) {
+    var min = Math.min.apply(null, values);
+    var max = Math.max.apply(null, values);
+    return values.map(function (value) {
+        return (value - min * 1.1) / (max - min * 1.1);
+    });
+}
+
+function insertZeros(values, zero) {
+    var output = [];
+    values.forEach(function (value) {
+        output.push(zero, value);
+    });
+    return output;
+}
+
+function tickText(start, stop, unit) {
+    var ticks = [];
+    for (var i = 0; i < 10; i++) {
+        var value = start + ((stop - start) * i) / 9;
+        ticks.push((value < 0 ? "-" : " ") + Math.abs(value).toFixed(1) + unit);
+    }
+    return ticks;
+}
+
+function applyThreshold(threshold) {
+    var peaks = meta.peaks;
+    var kept = [];
+    peaks.level.forEach(function (level, i) {
+        if (level > threshold) {
+            kept.push(i);
+        }
+    });
+    if (kept.length === 0) {
+        return;
+    }
+    var pick = function (values) {
+        return kept.map(function (i) {
+            return values[i];
+        });
+    };
+    var level = pick(peaks.level);
+    var time = pick(peaks.time);
+    var azimuth = pick(peaks.azimuth);
+    var elevation = pick(peaks.elevation);
+
+    var radius = normalize(level);
+    var x = [], y = [], z = [];
+    radius.forEach(function (r, i) {
+        var azimuthRad = (azimuth[i] * Math.PI) / 180;
+        var elevationRad = (elevation[i] * Math.PI) / 180;
+        x.push(r * Math.cos(azimuthRad) * Math.cos(elevationRad));
+        y.push(r * Math.sin(azimuthRad) * Math.cos(elevationRad));
+        z.push(r * Math.sin(elevationRad));
+    });
+
+    var color, ticktext;
+    if (meta.time_colorscale) {
+        color = normalize(time).reverse();
+        ticktext = tickText(
+            Math.max.apply(null, time), Math.min.apply(null, time), "ms"
+        );
+    } else {
+        color = radius;
+        ticktext = tickText(
+            Math.min.apply(null, level), Math.max.apply(null, level), "dB"
+        );
+    }
+    var customdata = level.map(function (value, i) {
+        return [value, time[i], azimuth[i], elevation[i]];
+    });
+
+    Plotly.restyle(
+        plot,
+        {
+            x: [insertZeros(x, 0)],
+            y: [insertZeros(y, 0)],
+            z: [insertZeros(z, 0)],
+            "marker.color": [insertZeros(color, 0)],
+            "line.color": [insertZeros(color, 0)],
+            "marker.colorbar.ticktext": [ticktext],
+            customdata: [insertZeros(customdata, [0, 0, 0, 0])],
+        },
+        [meta.hedgehog_trace]
+    );
+
+    var annotations = plot.layout.annotations || [];
+    annotations.forEach(function (annotation, i) {
+        if (annotation.text.indexOf("<b>Threshold:</b>") === 0) {
+            var update = {};
+            update["annotations[" + i + "].text"] = annotation.text.replace(
+                /^<b>Threshold:<\\/b>[^<]*/,
+                "<b>Threshold:</b> " + threshold + " dB"
+            );
+            Plotly.relayout(plot, update);
+        }
+    });
+}
+
+if (meta && meta.peaks) {
+    plot.on("plotly_sliderchange", function (event) {
+        applyThreshold(parseFloat(event.step.value));
+    });
+}
+"""
+
 
 def hedgehog(
     fig: go.Figure,
@@ -205,6 +324,77 @@ def hedgehog(
     return fig
 
 
+def threshold_slider(
+    fig: go.Figure,
+    time_peaks: np.ndarray,
+    reflex_to_direct: np.ndarray,
+    azimuth_peaks: np.ndarray,
+    elevation_peaks: np.ndarray,
+    signal_parameters: dict,
+) -> go.Figure:
+    """
+    Stores every detected peak in the figure and adds a threshold slider, so
+    the hedgehog can be filtered in the page by THRESHOLD_SLIDER_SCRIPT without
+    analyzing again. It must be called right after hedgehog.
+
+    Parameters
+    ----------
+    fig : go.Figure
+        Figure with the hedgehog as its last trace.
+    time_peaks : np.ndarray
+        Time of every peak in milliseconds.
+    reflex_to_direct : np.ndarray
+        Reflection-to-direct level of every peak in dB.
+    azimuth_peaks : np.ndarray
+        Azimuth of every peak in degrees.
+    elevation_peaks : np.ndarray
+        Elevation of every peak in degrees.
+    signal_parameters : dict
+        Dictionary with the threshold and colorscale selected by the user.
+
+    Returns
+    -------
+    go.Figure
+        Figure with the peaks in layout.meta and the slider.
+    """
+
+    threshold = signal_parameters["intensity_threshold"]
+    lowest = min(np.floor(np.min(reflex_to_direct[1:], initial=0)), threshold)
+    thresholds = np.union1d(
+        np.arange(lowest, 0 + THRESHOLD_STEP_DB, THRESHOLD_STEP_DB), [threshold]
+    )
+
+    fig.update_layout(
+        meta={
+            "hedgehog_trace": len(fig.data) - 1,
+            "time_colorscale": signal_parameters["time_colorscale"] is True,
+            "peaks": {
+                "time": time_peaks.tolist(),
+                "level": reflex_to_direct.tolist(),
+                "azimuth": azimuth_peaks.tolist(),
+                "elevation": elevation_peaks.tolist(),
+            },
+        },
+        sliders=[
+            {
+                "active": int(np.searchsorted(thresholds, threshold)),
+                "currentvalue": {"prefix": "Threshold: ", "suffix": " dB"},
+                "steps": [
+                    {"method": "skip", "label": f"{value:g}", "value": f"{value:g}"}
+                    for value in thresholds
+                ],
+                "x": 0.6,
+                "len": 0.4,
+                "y": 0.32,
+                "pad": {"t": 0},
+                "font": {"color": "#FFF"},
+            }
+        ],
+    )
+
+    return fig
+
+
 def w_channel(
     fig: go.Figure,
     time: np.ndarray,
@@ -213,6 +403,7 @@ def w_channel(
     title_xaxis: str,
     ylim: float,
     time_reflections: np.ndarray,
+    max_points: Optional[int] = W_CHANNEL_DISPLAY_POINTS,
 ) -> go.Figure:
     """summary
 
@@ -220,9 +411,19 @@ def w_channel(
     ----------
     fig : go.Figure
         description
+    max_points : Optional[int], optional
+        Number of points drawn. Longer traces are downsampled with LTTB, so
+        the page stays light while the exported data keeps every sample. If
+        None, every sample is drawn, by default W_CHANNEL_DISPLAY_POINTS.
     """
+    time_range = [0, max(time)]
+    if max_points is not None:
+        # Plotly draws as many points as the shorter array has
+        length = min(len(time), len(w_channel))
+        time, w_channel = lttb(time[:length], w_channel[:length], max_points)
+    scatter = go.Scattergl if len(time) > SCATTERGL_MIN_POINTS else go.Scatter
     fig.add_trace(
-        go.Scatter(
+        scatter(
             x=time,
             y=w_channel,
             line={
@@ -233,7 +434,7 @@ def w_channel(
             showlegend=False,
         )
     )
-    fig.update_layout(yaxis_range=yaxis, xaxis_range=[0, max(time)])
+    fig.update_layout(yaxis_range=yaxis, xaxis_range=time_range)
     fig.update_xaxes(title_text="Time [ms]", row=2, col=1)
     fig.update_yaxes(title_text=title_xaxis, row=2, col=1)
 
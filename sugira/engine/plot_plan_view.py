@@ -1,9 +1,10 @@
 """Plotting functions for Plan View section."""
 
-import base64
+from typing import Optional, Tuple
 import numpy as np
 import plotly.graph_objects as go
 from utils.formatter import spherical_to_cartesian
+from utils.plan_image import PLAN_DISPLAY_SIZE, PLAN_IMAGES
 from engine.intensity import min_max_normalization
 
 
@@ -184,20 +185,32 @@ def get_plotly_scenes():
     return camera, buttons
 
 
-def put_background_image(fig: go.Figure, image_background: str):
+def plan_layout_image(
+    image_background: str, max_size: Optional[Tuple[int, int]] = PLAN_DISPLAY_SIZE
+) -> dict:
+    """Layout image with the plan, filling the Plan View section behind the hedgehog.
+
+    The plan is downscaled to max_size (full resolution if None) and encoded
+    only once per image content and size."""
+    return {
+        "source": PLAN_IMAGES.data_uri(image_background, max_size),
+        "xref": "paper",
+        "yref": "paper",
+        "x": 0,
+        "y": 1,
+        "sizex": 1,
+        "sizey": 1,
+        "xanchor": "left",
+        "yanchor": "top",
+        "opacity": 1,
+        "layer": "below",
+    }
+
+
+def put_background_image(
+    fig: go.Figure,
+    image_background: str,
+    max_size: Optional[Tuple[int, int]] = PLAN_DISPLAY_SIZE,
+):
     """Puts the plan in the plotly figure to be edited and visualized in Plan View section."""
-    with open(image_background, "rb") as image_file:
-        plan_background = base64.b64encode(image_file.read())
-    fig.add_layout_image(
-        source=f"data:image/png;base64,{plan_background.decode()}",
-        xref="paper",
-        yref="paper",
-        x=0,
-        y=1,
-        sizex=1,
-        sizey=1,
-        xanchor="left",
-        yanchor="top",
-        opacity=1,
-        layer="below",
-    )
+    fig.add_layout_image(**plan_layout_image(image_background, max_size))
@@ -1,5 +1,7 @@
 """"W channel preprocessing"""
 
+from typing import Optional
+
 import numpy as np
 
 from utils.filters import moving_average
@@ -11,6 +13,7 @@ def w_preprocess(
     window_size: int,
     analysis_length: float,
     sample_rate: int,
+    onset_idx: Optional[int] = None,
 ) -> np.ndarray:
     """
     Preprocesses the W channel by cropping, filtering, and converting to decibels.
@@ -25,6 +28,9 @@ def w_preprocess(
         Analysis length in seconds.
     sample_rate : int
         Sample rate in Hz.
+    onset_idx : Optional[int], optional
+        Index of the direct sound. If None, it is the peak of the W channel,
+        by default None.
 
     Returns
     -------
@@ -34,7 +40,9 @@ def w_preprocess(
         W channel in decibels.
     """
 
-    w_channel_cropped = np.abs(crop_1d(w_channel, analysis_length, sample_rate))
+    w_channel_cropped = np.abs(
+        crop_1d(w_channel, analysis_length, sample_rate, onset_idx)
+    )
     w_channel_filtered = moving_average(w_channel_cropped, int(window_size / 2))
     w_channel_filtered /= np.max(w_channel_filtered)
 
@@ -1,15 +1,102 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5 import QtWebEngineWidgets
 import sys
+import threading
 from pathlib import Path
-from utils.embed_files import read_from_json, generate_html
-from engine.plot_plan_view import put_background_image
+from utils.embed_files import (
+    PLOTLY_JS_ASSET,
+    figure_html,
+    plotly_js,
+    react_traces_script,
+    read_from_json,
+    relayout_script,
+)
+from engine.plot_plan_view import plan_layout_image, put_background_image
 from typing import List
 from engine.input import InputFormat
-from core import SeaUrchinAnalyzer
+from engine.plot import THRESHOLD_SLIDER_SCRIPT
+from core import ANALYSIS_STEPS, AnalysisCancelled, SeaUrchinAnalyzer
+from utils.run_context import RunContext
+from utils.web_scheme import (
+    PLOTLY_JS_URL,
+    SCHEME,
+    FigureSchemeHandler,
+    register_scheme,
+)
 import zipfile
 
 
+class AnalysisWorker(QtCore.QObject):
+    """
+    Runs one analysis outside the GUI thread, reporting its progress and
+    stopping between steps when it is cancelled.
+    """
+
+    progress = QtCore.pyqtSignal(int, str)
+    finished = QtCore.pyqtSignal(int, object, object, str)
+    failed = QtCore.pyqtSignal(int, str)
+    done = QtCore.pyqtSignal()
+
+    def __init__(
+        self,
+        run_id: int,
+        analyzer: SeaUrchinAnalyzer,
+        input_dict: dict,
+        signal_parameters: dict,
+        run_context: RunContext,
+    ):
+        super().__init__()
+        self.run_id = run_id
+        self.analyzer = analyzer
+        self.input_dict = input_dict
+        self.signal_parameters = signal_parameters
+        self.run_context = run_context
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def report(self, step: str):
+        if self.cancel_event.is_set():
+            raise AnalysisCancelled(step)
+        self.progress.emit(self.run_id, step)
+
+    def run(self):
+        try:
+            fig = self.analyzer.analyze(
+                input_dict=self.input_dict,
+                signal_parameters=self.signal_parameters,
+                show=False,
+                progress=self.report,
+                run_context=self.run_context,
+                save_html=False,
+            )
+            html_content = figure_html(
+                fig, PLOTLY_JS_URL, post_script=THRESHOLD_SLIDER_SCRIPT
+            )
+            self.finished.emit(self.run_id, fig, self.run_context, html_content)
+        except AnalysisCancelled:
+            self.run_context.cleanup()
+        except Exception as error:  # pylint: disable=broad-except
+            self.run_context.cleanup()
+            self.failed.emit(self.run_id, repr(error))
+        finally:
+            self.done.emit()
+
+
+class MainWindow(QtWidgets.QMainWindow):
+    """
+    Main window that announces when it is closing, so running analyses can be
+    stopped before their threads are torn down.
+    """
+
+    closing = QtCore.pyqtSignal()
+
+    def closeEvent(self, event):  # pylint: disable=invalid-name
+        self.closing.emit()
+        super().closeEvent(event)
+
+
 class MainWindowUI(object):
     """
     Class associated with the main window with their respective style and associated methods.
@@ -17,9 +104,26 @@ class MainWindowUI(object):
 
     signals_in_memory = False
     has_plane = False
+    plan_image = None
+    # Whether the plan view page is loaded and can be updated in place
+    plan_view_ready = False
+    PLAN_VIEW_DIV_ID = "sugira-plan-view"
+    # Kept between Process clicks so unchanged analysis stages are reused
+    analyzer = SeaUrchinAnalyzer()
+    run_id = 0
+    analysis_worker = None
+    # Outputs of the analysis on screen, read by the export and plan view
+    run_context = None
 
     def main_window_config(self, MainWindow: QtWidgets.QMainWindow):
         MainWindow.setObjectName("MainWindow")
+        # Running threads and their workers, kept alive until each thread ends
+        self.analysis_threads = {}
+        # Figures are shown from memory through the sugira:// scheme
+        self.scheme_handler = FigureSchemeHandler(MainWindow)
+        QtWebEngineWidgets.QWebEngineProfile.defaultProfile().installUrlSchemeHandler(
+            SCHEME, self.scheme_handler
+        )
         MainWindow.setFixedSize(QtCore.QSize(1700, 900))
         MainWindow.setWindowTitle("SUGIRA")
         MainWindow.setWindowIcon(QtGui.QIcon("docs/images/sugira_icon.png"))
@@ -386,6 +490,46 @@ class MainWindowUI(object):
         self.frame_push_buttons2.layout().addWidget(self.pb_export)
         self.frame_push_buttons2.layout().addWidget(self.pb_clean)
         self.verticalLayout_6.addWidget(self.frame_push_buttons2)
+        self.verticalLayout_6.addItem(vertical_space2)
+
+        # Analysis progress
+        self.frame_progress = QtWidgets.QFrame(self.frame_analyze)
+        self.frame_progress.setLayout(QtWidgets.QHBoxLayout())
+        self.frame_progress.layout().setContentsMargins(0, 0, 0, 0)
+
+        self.progress_bar = QtWidgets.QProgressBar(self.frame_progress)
+        self.progress_bar.setRange(0, len(ANALYSIS_STEPS))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Idle")
+        self.progress_bar.setObjectName("progress_bar")
+        self.progress_bar.setStyleSheet(
+            """
+            QProgressBar {
+                border: 2px solid rgb(140, 140, 140);
+                border-radius: 5px;
+                color: white;
+                text-align: center;
+                font-size: 10pt;
+            }
+            QProgressBar::chunk {
+                background-color: rgba(255, 99, 71, 0.6);
+            }
+        """
+        )
+
+        # Cancel
+        self.pb_cancel = QtWidgets.QPushButton(self.frame_progress)
+        self.pb_cancel.setText("Cancel")
+        self.pb_cancel.setMinimumSize(QtCore.QSize(80, 30))
+        self.pb_cancel.setStyleSheet(push_buttons_grey_style)
+        self.pb_cancel.setObjectName("cancel_pb")
+        self.pb_cancel.setCursor(QtCore.Qt.PointingHandCursor)
+        self.pb_cancel.setEnabled(False)
+        self.pb_cancel.clicked.connect(self.cancel_analysis)
+
+        self.frame_progress.layout().addWidget(self.progress_bar)
+        self.frame_progress.layout().addWidget(self.pb_cancel)
+        self.verticalLayout_6.addWidget(self.frame_progress)
 
         self.sugiraLogoVerticalLayout.addWidget(self.frame_analyze)
         self.horizontalLayout.addWidget(self.frame_inputs)
@@ -522,6 +666,7 @@ class MainWindowUI(object):
             str(Path("docs/background.html").resolve())
         )
         self.plan_view_holder.load(background_url)
+        self.plan_view_holder.loadFinished.connect(self.plan_view_loaded)
         self.graphicsLayout_plan.addWidget(self.plan_view_holder)
 
         self.horizontalLayout_plan.addWidget(self.frame_graphics_plan)
@@ -547,61 +692,144 @@ class MainWindowUI(object):
 
     def process_data(self):
         try:
-            self.signals_in_memory = True
             signal_parameters = self.collect_main_parameters()
             input_data = self.load_window.collect_signal_parameters()
-            analyzer = SeaUrchinAnalyzer()
-            fig = analyzer.analyze(
-                input_dict=input_data,
-                signal_parameters=signal_parameters,
-                show=False,
-            )
-            url = QtCore.QUrl.fromLocalFile(str(Path("sugira.html").resolve()))
-            self.graphics_holder.load(url)
-            self.plotly_fig = fig
         except AttributeError:
             self.signals_in_memory = False
-            msg_box = QtWidgets.QMessageBox()
-            msg_box.setIcon(QtWidgets.QMessageBox.Warning)
-            msg_box.setWindowTitle("Invalid Signals")
-            msg_box.setText("There are no signals loaded.")
-            msg_box.setStyleSheet(
-                """
-                QMessageBox {
-                    background-color: #2f2c33;
-                    color: white;
-                    border: 2px solid #a0a0a0;
-                }
-                QMessageBox QLabel {
-                    color: white;
-                }
-                QMessageBox QPushButton {
-                    background-color: white;
-                    color: black;
-                    border: 2px solid #1f1b24;
-                    padding: 5px;
-                    border-radius: 5px;
-                    icon-size: 0px;
-                }
-                QMessageBox QPushButton:hover {
-                    background-color: rgba(255, 99, 71, 0.6);
-                    border: 2px solid rgba(255, 99, 71, 1);
-                }
+            self.show_warning("Invalid Signals", "There are no signals loaded.")
+            return
+
+        # A newer run makes the one in flight stale
+        self.cancel_analysis()
+        self.run_id += 1
+
+        thread = QtCore.QThread()
+        worker = AnalysisWorker(
+            self.run_id,
+            self.analyzer,
+            input_data,
+            signal_parameters,
+            RunContext.create(),
+        )
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(self.analysis_progress)
+        worker.finished.connect(self.analysis_finished)
+        worker.failed.connect(self.analysis_failed)
+        worker.done.connect(thread.quit)
+        worker.done.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self.analysis_threads.pop(thread, None))
+
+        self.analysis_threads[thread] = worker
+        self.analysis_worker = worker
+        self.pb_cancel.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Queued")
+        thread.start()
+
+    def cancel_analysis(self):
+        if self.analysis_worker is not None:
+            self.analysis_worker.cancel()
+            self.analysis_worker = None
+        self.pb_cancel.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Idle")
+
+    def stop_analyses(self):
+        """
+        Cancels every analysis still running, stale ones included, and waits
+        for their threads to finish.
+        """
+        self.cancel_analysis()
+        for thread, worker in list(self.analysis_threads.items()):
+            worker.cancel()
+            # worker.done only reaches thread.quit through this (blocked) thread
+            thread.quit()
+            thread.wait()
+
+    def analysis_progress(self, run_id: int, step: str):
+        if run_id != self.run_id:
+            return
+        self.progress_bar.setValue(ANALYSIS_STEPS.index(step))
+        self.progress_bar.setFormat(step.capitalize())
+
+    def analysis_finished(
+        self, run_id: int, fig, run_context: RunContext, html_content: str
+    ):
+        if run_id != self.run_id:
+            run_context.cleanup()
+            return
+        self.release_run_context()
+        self.run_context = run_context
+        self.analysis_worker = None
+        self.pb_cancel.setEnabled(False)
+        self.progress_bar.setValue(len(ANALYSIS_STEPS))
+        self.progress_bar.setFormat("Done")
+        self.signals_in_memory = True
+        url = self.scheme_handler.publish("sugira", html_content)
+        self.graphics_holder.load(url)
+        self.plotly_fig = fig
+        if self.has_plane:
+            self.update_plan_view_traces()
+
+    def release_run_context(self):
+        if self.run_context is not None:
+            self.run_context.cleanup()
+            self.run_context = None
+
+    def analysis_failed(self, run_id: int, error: str):
+        if run_id != self.run_id:
+            return
+        self.analysis_worker = None
+        self.pb_cancel.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("Failed")
+        self.show_warning("Analysis Failed", f"The analysis failed:\n{error}")
+
+    def show_warning(self, title: str, text: str):
+        msg_box = QtWidgets.QMessageBox()
+        msg_box.setIcon(QtWidgets.QMessageBox.Warning)
+        msg_box.setWindowTitle(title)
+        msg_box.setText(text)
+        msg_box.setStyleSheet(
             """
-            )
-            msg_box.exec_()
+            QMessageBox {
+                background-color: #2f2c33;
+                color: white;
+                border: 2px solid #a0a0a0;
+            }
+            QMessageBox QLabel {
+                color: white;
+            }
+            QMessageBox QPushButton {
+                background-color: white;
+                color: black;
+                border: 2px solid #1f1b24;
+                padding: 5px;
+                border-radius: 5px;
+                icon-size: 0px;
+            }
+            QMessageBox QPushButton:hover {
+                background-color: rgba(255, 99, 71, 0.6);
+                border: 2px solid rgba(255, 99, 71, 1);
+            }
+        """
+        )
+        msg_box.exec_()
 
     def clean_plot(self):
         background_url = QtCore.QUrl.fromLocalFile(
             str(Path("docs/background.html").resolve())
         )
         self.graphics_holder.load(background_url)
+        self.plan_view_ready = False
         self.plan_view_holder.load(background_url)
 
     def export_data(self):
-        sugira_html_path = QtCore.QFileInfo("sugira.html").absoluteFilePath()
-        hedgehog_txt_path = QtCore.QFileInfo("hedgehog.txt").absoluteFilePath()
-        w_channel_txt_path = QtCore.QFileInfo("w_channel.txt").absoluteFilePath()
+        if self.run_context is None:
+            self.show_warning("Invalid Signals", "There are no signals loaded.")
+            return
 
         save_dir = QtWidgets.QFileDialog.getExistingDirectory(
             None, "Directory to save measurements data"
@@ -609,9 +837,24 @@ class MainWindowUI(object):
         if save_dir:
             zip_file_path = Path(save_dir) / "sugira.zip"
             with zipfile.ZipFile(zip_file_path, "w") as zipf:
-                zipf.write(sugira_html_path, arcname="sugira.html")
-                zipf.write(hedgehog_txt_path, arcname="hedgehog.txt")
-                zipf.write(w_channel_txt_path, arcname="w_channel.txt")
+                zipf.writestr(
+                    "sugira.html",
+                    figure_html(
+                        self.plotly_fig,
+                        PLOTLY_JS_ASSET,
+                        post_script=THRESHOLD_SLIDER_SCRIPT,
+                    ),
+                )
+                zipf.writestr(PLOTLY_JS_ASSET, plotly_js())
+                if self.has_plane:
+                    # The exported plan view keeps the plan at full resolution
+                    fig = read_from_json(self.run_context.plan_view_json_path)
+                    put_background_image(fig, self.plan_image, max_size=None)
+                    zipf.writestr(
+                        "sugira_plan_view.html", figure_html(fig, PLOTLY_JS_ASSET)
+                    )
+                zipf.write(self.run_context.hedgehog_txt_path, arcname="hedgehog.txt")
+                zipf.write(self.run_context.w_channel_txt_path, arcname="w_channel.txt")
 
     def load_plan(self):
         if self.signals_in_memory == False:
@@ -661,12 +904,51 @@ class MainWindowUI(object):
             self.process_plan(file_name)
 
     def process_plan(self, plan_image: str):
-        fig = read_from_json()
-        put_background_image(fig, plan_image)
-        generate_html(fig, "sugira_plan_view.html")
-        url = QtCore.QUrl.fromLocalFile(str(Path("sugira_plan_view.html").resolve()))
+        self.plan_image = plan_image
+        if not self.plan_view_ready:
+            self.load_plan_view()
+            return
+
+        # Only the plan image is sent to the page already showing the hedgehog
+        layout_image = plan_layout_image(plan_image, self.plan_display_size())
+        self.plan_view_holder.page().runJavaScript(
+            relayout_script(self.PLAN_VIEW_DIV_ID, {"images": [layout_image]})
+        )
+
+    def update_plan_view_traces(self):
+        if not self.plan_view_ready:
+            self.load_plan_view()
+            return
+
+        # Only the new hedgehog is sent, keeping the plan and the camera
+        fig = read_from_json(self.run_context.plan_view_json_path)
+        self.plan_view_holder.page().runJavaScript(
+            react_traces_script(self.PLAN_VIEW_DIV_ID, fig)
+        )
+
+    def load_plan_view(self):
+        fig = read_from_json(self.run_context.plan_view_json_path)
+        put_background_image(fig, self.plan_image, self.plan_display_size())
+        url = self.scheme_handler.publish(
+            "sugira_plan_view",
+            figure_html(fig, PLOTLY_JS_URL, self.PLAN_VIEW_DIV_ID),
+        )
+        self.plan_view_ready = False
         self.plan_view_holder.load(url)
 
+    def plan_display_size(self):
+        # Plans are downscaled to the pixels the plan view actually shows
+        pixel_ratio = self.plan_view_holder.devicePixelRatioF()
+        return (
+            int(self.frame_graphics_plan.width() * pixel_ratio),
+            int(self.frame_graphics_plan.height() * pixel_ratio),
+        )
+
+    def plan_view_loaded(self, ok: bool):
+        self.plan_view_ready = (
+            ok and self.plan_view_holder.url().scheme() == SCHEME.decode()
+        )
+
     def export_plan_view(self):
         if self.signals_in_memory is False or self.has_plane is False:
             msg_box = QtWidgets.QMessageBox()
@@ -893,6 +1175,27 @@ class LoadSignalsWindow(QtWidgets.QWidget):
         self.signals_browser(
             self.lss_with_if_grid_layout, ["FLU", "FRD", "BRU", "BLD", "IF"]
         )
+        self.lss_streaming = QtWidgets.QCheckBox("Stream long recordings from disk")
+        self.lss_streaming.setStyleSheet(
+            """
+            QCheckBox {
+                color: white;
+                font-size: 12pt;
+            }
+            QCheckBox::indicator {
+                width: 15px;
+                height: 15px;
+                border-radius: 7px;
+                background-color: white;
+                border: 1px solid #1f1b24;
+            }
+            QCheckBox::indicator:checked {
+                background-color: rgba(255, 99, 71, 0.6);
+                border: 2px solid rgba(255, 99, 71, 1);
+            }
+        """
+        )
+        self.lss_with_if_layout.addWidget(self.lss_streaming)
 
     def signals_browser(self, layout: QtWidgets.QGridLayout, signals: List[str]):
         for row, signal_name in enumerate(signals):
@@ -1145,6 +1448,7 @@ class LoadSignalsWindow(QtWidgets.QWidget):
                 "input_mode": InputFormat.LSS,
                 "channels_per_file": 1,
                 "frequency_correction": True,
+                "streaming": self.lss_streaming.isChecked(),
                 **signals_path,
             }
 
@@ -1200,10 +1504,14 @@ class LoadSignalsWindow(QtWidgets.QWidget):
 
 if __name__ == "__main__":
     sys.argv.append("--no-sandbox")
+    register_scheme()
     app = QtWidgets.QApplication(sys.argv)
     app.setStyle("Fusion")
-    MainWindow = QtWidgets.QMainWindow()
+    main_window = MainWindow()
     ui = MainWindowUI()
-    ui.main_window_config(MainWindow)
-    MainWindow.show()
+    ui.main_window_config(main_window)
+    main_window.closing.connect(ui.stop_analyses)
+    main_window.show()
+    app.aboutToQuit.connect(ui.stop_analyses)
+    app.aboutToQuit.connect(ui.release_run_context)
     sys.exit(app.exec_())
@@ -1,18 +1,179 @@
 """"Audio utilities"""
 
-from typing import List
+import os
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import List, Tuple, Union
 import numpy as np
 import soundfile as sf
 
+AUDIO_CACHE_MAX_BYTES = 512 * 1024**2
 
-def read_signals(input_data_dict: dict) -> dict:
+STREAMED_KEYS = [
+    "front_left_up",
+    "front_right_down",
+    "back_right_up",
+    "back_left_down",
+    "inverse_filter",
+]
+
+
+def file_signature(path: Union[str, Path]) -> Tuple[str, int, int]:
+    """
+    Identifies the current content of a file without reading it.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Path to the file.
+
+    Returns
+    -------
+    Tuple[str, int, int]
+        Resolved path, size in bytes and modification time in nanoseconds.
+    """
+
+    stat = os.stat(path)
+
+    return str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def input_signature(input_data_dict: dict) -> tuple:
+    """
+    Identifies a set of measurements by its parameters and the content of its
+    files, so results derived from it can be reused while neither changes.
+
+    Parameters
+    ----------
+    input_data_dict : dict
+        Dictionary containing paths to audio files and other relevant information.
+
+    Returns
+    -------
+    tuple
+        Hashable signature of the measurements.
+    """
+
+    signature = []
+    for key_i, value_i in sorted(input_data_dict.items()):
+        if isinstance(value_i, (str, Path)) and os.path.isfile(value_i):
+            signature.append((key_i, file_signature(value_i)))
+        else:
+            signature.append((key_i, str(value_i)))
+
+    return tuple(signature)
+
+
+class AudioCache:
+    """
+    Least recently used cache of decoded audio files, bounded in memory.
+
+    Entries are keyed by file_signature, so a file that changes on disk is
+    decoded again. Cached signals are read-only.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum memory used by the cached signals, by default
+        AUDIO_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, max_bytes: int = AUDIO_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def read(
+        self, path: Union[str, Path], dtype: str = "float64"
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Reads an audio file, decoding it only if it is not cached.
+
+        Parameters
+        ----------
+        path : Union[str, Path]
+            Path to the audio file.
+        dtype : str, optional
+            Data type of the decoded samples, "float64" or "float32". Each one
+            is cached separately, by default "float64".
+
+        Returns
+        -------
+        Tuple[np.ndarray, int]
+            Read-only signal with shape (samples, channels) and its sample rate.
+        """
+
+        key = (file_signature(path), dtype)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        signal, sample_rate = sf.read(path, dtype=dtype)
+        signal.setflags(write=False)
+
+        with self._lock:
+            if signal.nbytes <= self.max_bytes and key not in self._entries:
+                self._entries[key] = (signal, sample_rate)
+                self.nbytes += signal.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, (evicted_signal, _) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted_signal.nbytes
+
+        return signal, sample_rate
+
+    def clear(self) -> None:
+        """Removes every cached signal and resets the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        Reports the cache usage.
+
+        Returns
+        -------
+        dict
+            Hits, misses, number of cached files and cached bytes.
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+            }
+
+
+AUDIO_CACHE = AudioCache()
+
+
+def read_signals(input_data_dict: dict, dtype: str = "float64") -> dict:
     """
     Reads audio signals from given paths and organizes them in a dictionary.
+    Decoded files are kept in AUDIO_CACHE, so repeated analyses of the same
+    files don't read them from disk again.
 
     Parameters
     ----------
     input_data_dict : dict
         Dictionary containing paths to audio files and other relevant information.
+        If "streaming" is set, LSS recordings and the inverse filter are not
+        loaded and their paths are kept instead.
+    dtype : str, optional
+        Data type of the read samples, "float64" or "float32", by default
+        "float64".
 
     Returns
     -------
@@ -26,6 +187,7 @@ def read_signals(input_data_dict: dict) -> dict:
     signals_paths = {}
 
     sample_rate = ...
+    streamed_keys = STREAMED_KEYS if input_data_dict.get("streaming") else []
 
     for key_i, path_i in input_data_dict.items():
 
@@ -41,12 +203,18 @@ def read_signals(input_data_dict: dict) -> dict:
             "z_channel",
             "w_channel",
         ]:
-            try:
-                signal, sample_rate = sf.read(path_i)
-                signals_dict[key_i] = signal.T
+            if key_i in streamed_keys:
+                # Streamed signals are read in blocks when they are processed
+                sample_rate = sf.info(path_i).samplerate
+                signals_dict[key_i] = path_i
                 signals_paths[key_i] = path_i
-            except:
-                pass
+            else:
+                try:
+                    signal, sample_rate = AUDIO_CACHE.read(path_i, dtype)
+                    signals_dict[key_i] = signal.T
+                    signals_paths[key_i] = path_i
+                except:
+                    pass
         signals_dict["sample_rate"] = sample_rate
 
     if input_data_dict["channels_per_file"] == 1:
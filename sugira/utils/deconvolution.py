@@ -0,0 +1,302 @@
+"""Deconvolution of logarithmic sine sweep measurements."""
+
+import hashlib
+from collections import OrderedDict
+from contextlib import ExitStack
+from threading import Lock
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import soundfile as sf
+from scipy.fft import irfft, next_fast_len, rfft
+from scipy.signal import fftconvolve
+
+INVERSE_FILTER_CACHE_SIZE = 4
+STREAMING_BLOCK_SIZE = 2**16
+
+
+class InverseFilterSpectra:
+    """
+    Cache of inverse filter spectra keyed by the filter content and FFT length.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Number of spectra kept in memory, by default INVERSE_FILTER_CACHE_SIZE.
+    """
+
+    def __init__(self, max_entries: int = INVERSE_FILTER_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._spectra = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, inverse_filter: np.ndarray, fft_length: int) -> np.ndarray:
+        """
+        Returns the spectrum of an inverse filter, computing it only once.
+
+        Parameters
+        ----------
+        inverse_filter : np.ndarray
+            Inverse filter of the sweep.
+        fft_length : int
+            FFT length of the spectrum.
+
+        Returns
+        -------
+        np.ndarray
+            Read-only real FFT of the inverse filter.
+        """
+
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(inverse_filter).tobytes(), digest_size=16
+        ).hexdigest()
+        key = (digest, inverse_filter.dtype.str, fft_length)
+
+        with self._lock:
+            if key in self._spectra:
+                self._spectra.move_to_end(key)
+                return self._spectra[key]
+
+        spectrum = rfft(inverse_filter, fft_length)
+        spectrum.setflags(write=False)
+
+        with self._lock:
+            self._spectra[key] = spectrum
+            while len(self._spectra) > self.max_entries:
+                self._spectra.popitem(last=False)
+
+        return spectrum
+
+
+INVERSE_FILTER_SPECTRA = InverseFilterSpectra()
+
+
+def deconvolve(
+    signals: Union[np.ndarray, Sequence[np.ndarray]],
+    inverse_filter: np.ndarray,
+    keep_length: Optional[int] = None,
+    pre_margin: int = 0,
+) -> np.ndarray:
+    """
+    Convolves every sweep recording with the inverse filter.
+
+    The inverse filter spectrum is computed once and shared by all channels.
+    Channels are processed one at a time, so only one full-length convolution
+    is held in memory while the output is being filled.
+
+    Parameters
+    ----------
+    signals : Union[np.ndarray, Sequence[np.ndarray]]
+        Sweep recordings with shape (channels, samples).
+    inverse_filter : np.ndarray
+        Inverse filter of the sweep.
+    keep_length : Optional[int], optional
+        Number of samples kept after the direct sound. If None, the full
+        convolution is returned, by default None.
+    pre_margin : int, optional
+        Number of samples kept before the direct sound when keep_length is
+        given, by default 0.
+
+    Returns
+    -------
+    np.ndarray
+        Impulse responses with shape (channels, samples).
+    """
+
+    channels_count = len(signals)
+    full_length = len(signals[0]) + len(inverse_filter) - 1
+    fft_length = next_fast_len(full_length, real=True)
+    inverse_spectrum = INVERSE_FILTER_SPECTRA.get(inverse_filter, fft_length)
+
+    output = None
+    region = slice(0, full_length)
+    for channel_i, signal in enumerate(signals):
+        impulse_response = irfft(
+            rfft(signal, fft_length) * inverse_spectrum, fft_length
+        )
+
+        if output is None:
+            if keep_length is not None:
+                # The direct sound of the first channel sets the kept region
+                direct_sound_idx = np.argmax(np.abs(impulse_response[:full_length]))
+                region_start = max(direct_sound_idx - pre_margin, 0)
+                region_end = min(direct_sound_idx + keep_length, full_length)
+                region = slice(region_start, region_end)
+            output = np.empty(
+                (channels_count, region.stop - region.start),
+                dtype=impulse_response.dtype,
+            )
+
+        output[channel_i] = impulse_response[region]
+
+    return output
+
+
+def read_frames(audio_file: sf.SoundFile, start: int, frames: int) -> np.ndarray:
+    """
+    Reads a block of the first channel of an open audio file.
+
+    Parameters
+    ----------
+    audio_file : sf.SoundFile
+        Open audio file.
+    start : int
+        First frame to read.
+    frames : int
+        Number of frames to read.
+
+    Returns
+    -------
+    np.ndarray
+        Block of samples.
+    """
+
+    audio_file.seek(start)
+    block = audio_file.read(frames, dtype="float64", always_2d=True)
+
+    return block[:, 0]
+
+
+def deconvolve_region(
+    sweep_files: List[sf.SoundFile],
+    inverse_filter_file: sf.SoundFile,
+    region_start: int,
+    region_length: int,
+    block_size: int = STREAMING_BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    Computes one region of the convolution of the sweeps with the inverse filter.
+
+    The recordings are read block by block. Each block is convolved with
+    only the slice of the inverse filter that reaches the region, so memory
+    is bounded by the block size and the region length.
+
+    Parameters
+    ----------
+    sweep_files : List[sf.SoundFile]
+        Open sweep recordings, one per channel.
+    inverse_filter_file : sf.SoundFile
+        Open inverse filter.
+    region_start : int
+        First output sample of the region.
+    region_length : int
+        Number of output samples in the region.
+    block_size : int, optional
+        Number of recording samples read at once, by default STREAMING_BLOCK_SIZE.
+
+    Returns
+    -------
+    np.ndarray
+        Region of the impulse responses with shape (channels, region_length).
+    """
+
+    filter_length = inverse_filter_file.frames
+    recording_length = min(sweep_file.frames for sweep_file in sweep_files)
+    region_stop = region_start + region_length
+    region = np.zeros((len(sweep_files), region_length))
+
+    first_sample = max(region_start - filter_length + 1, 0)
+    last_sample = min(region_stop, recording_length)
+    for block_start in range(first_sample, last_sample, block_size):
+        block_stop = min(block_start + block_size, last_sample)
+
+        # Inverse filter samples that map this block into the region
+        filter_start = max(region_start - block_stop + 1, 0)
+        filter_stop = min(region_stop - block_start, filter_length)
+        if filter_start >= filter_stop:
+            continue
+
+        block = np.vstack(
+            [
+                read_frames(sweep_file, block_start, block_stop - block_start)
+                for sweep_file in sweep_files
+            ]
+        )
+        filter_slice = read_frames(
+            inverse_filter_file, filter_start, filter_stop - filter_start
+        )
+        contribution = fftconvolve(block, filter_slice[np.newaxis, :], axes=1)
+
+        offset = block_start + filter_start - region_start
+        contribution_start = max(-offset, 0)
+        contribution_stop = min(contribution.shape[1], region_length - offset)
+        region[
+            :, offset + contribution_start : offset + contribution_stop
+        ] += contribution[:, contribution_start:contribution_stop]
+
+    return region
+
+
+def stream_deconvolve(
+    sweep_paths: Sequence[str],
+    inverse_filter_path: str,
+    keep_length: Optional[int] = None,
+    pre_margin: int = 0,
+    block_size: int = STREAMING_BLOCK_SIZE,
+) -> np.ndarray:
+    """
+    Deconvolves sweep recordings read from disk in blocks, keeping only the
+    impulse response region around the direct sound.
+
+    The direct sound is first searched on the first channel between the end
+    of the inverse filter and the end of the recording, where the linear
+    impulse response of a sweep measurement lies. Then only the kept region is
+    computed for every channel.
+
+    Parameters
+    ----------
+    sweep_paths : Sequence[str]
+        Paths of the sweep recordings, one per channel.
+    inverse_filter_path : str
+        Path of the inverse filter.
+    keep_length : Optional[int], optional
+        Number of samples kept after the direct sound. If None, the full
+        convolution is returned, by default None.
+    pre_margin : int, optional
+        Number of samples kept before the direct sound, by default 0.
+    block_size : int, optional
+        Number of recording samples read at once, by default STREAMING_BLOCK_SIZE.
+
+    Returns
+    -------
+    np.ndarray
+        Impulse responses with shape (channels, samples).
+    """
+
+    with ExitStack() as stack:
+        sweep_files = [
+            stack.enter_context(sf.SoundFile(sweep_path)) for sweep_path in sweep_paths
+        ]
+        inverse_filter_file = stack.enter_context(sf.SoundFile(inverse_filter_path))
+
+        filter_length = inverse_filter_file.frames
+        recording_length = min(sweep_file.frames for sweep_file in sweep_files)
+        full_length = recording_length + filter_length - 1
+
+        if keep_length is None:
+            return deconvolve_region(
+                sweep_files, inverse_filter_file, 0, full_length, block_size
+            )
+
+        search_start, search_stop = filter_length - 1, recording_length
+        if search_stop <= search_start:
+            search_start, search_stop = 0, full_length
+        search_region = deconvolve_region(
+            sweep_files[:1],
+            inverse_filter_file,
+            search_start,
+            search_stop - search_start,
+            block_size,
+        )
+        direct_sound_idx = search_start + np.argmax(np.abs(search_region[0]))
+
+        region_start = max(direct_sound_idx - pre_margin, 0)
+        region_stop = min(direct_sound_idx + keep_length, full_length)
+
+        return deconvolve_region(
+            sweep_files,
+            inverse_filter_file,
+            region_start,
+            region_stop - region_start,
+            block_size,
+        )
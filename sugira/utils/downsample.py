@@ -0,0 +1,59 @@
+"""Downsampling of long traces for display."""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> Tuple[np.ndarray]:
+    """
+    Downsamples a trace with Largest-Triangle-Three-Buckets, which keeps the
+    points that shape the curve, so peaks survive the reduction.
+
+    The first and last points are always kept. The rest of the trace is split
+    into max_points - 2 buckets and, from each one, the point forming the
+    largest triangle with the point kept from the previous bucket and the mean
+    of the next bucket is kept.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Increasing horizontal values of the trace.
+    y : np.ndarray
+        Vertical values of the trace.
+    max_points : int
+        Number of points kept. Traces with fewer points are returned as they are.
+
+    Returns
+    -------
+    Tuple[np.ndarray]
+        Horizontal and vertical values of the kept points.
+    """
+
+    if max_points < 3 or len(x) <= max_points:
+        return x, y
+
+    # Bucket edges over the points between the first and the last one
+    edges = np.linspace(1, len(x) - 1, max_points - 1).astype(np.int64)
+    bucket_sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    bucket_sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    bucket_sizes = np.diff(edges)
+
+    # Mean of the following bucket of each one, with the last point after the
+    # last bucket
+    next_mean_x = np.append(bucket_sums_x[1:] / bucket_sizes[1:], x[-1])
+    next_mean_y = np.append(bucket_sums_y[1:] / bucket_sizes[1:], y[-1])
+
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, len(x) - 1
+    previous = 0
+    for bucket_i, (start, stop) in enumerate(zip(edges[:-1], edges[1:])):
+        # Twice the area of the triangles, the factor doesn't change the argmax
+        area = np.abs(
+            (x[previous] - next_mean_x[bucket_i]) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_mean_y[bucket_i] - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket_i + 1] = previous
+
+    return x[kept], y[kept]
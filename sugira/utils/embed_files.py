@@ -1,10 +1,112 @@
 """Script to generate .html files to be embed in GUI as plot."""
 
+import json
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Union
+
 from plotly import graph_objects as go
 import plotly.express
+import plotly.offline
+from plotly.io.json import to_json_plotly
+
+PLOTLY_JS_ASSET = f"plotly-{plotly.offline.get_plotlyjs_version()}.min.js"
+
+BACKGROUND_STYLE = """
+        <style>
+            body {
+                background-color: #1f1b24;
+            }
+        </style>
+    """
+
+
+def figure_html(
+    fig: go.Figure,
+    include_plotlyjs: Union[bool, str] = True,
+    div_id: Optional[str] = None,
+    post_script: Optional[str] = None,
+) -> str:
+    """
+    Builds the .html page of a figure, with the GUI background style.
+
+    Parameters
+    ----------
+    fig : go.Figure
+        Plotly figure.
+    include_plotlyjs : Union[bool, str], optional
+        True to embed plotly.js in the page, or the URL of a plotly.js file to
+        reference instead, by default True.
+    div_id : Optional[str], optional
+        Id of the plot element, to update the plot from scripts. If None, a
+        random id is used, by default None.
+    post_script : Optional[str], optional
+        JavaScript run after the plot is drawn, where {plot_id} is replaced by
+        the id of the plot element, by default None.
+
+    Returns
+    -------
+    str
+        .html page.
+    """
+
+    html_content = fig.to_html(
+        full_html=True,
+        include_plotlyjs=include_plotlyjs,
+        div_id=div_id,
+        post_script=post_script,
+    )
+
+    return html_content.replace("<head>", "<head>" + BACKGROUND_STYLE, 1)
+
+
+@lru_cache(maxsize=1)
+def plotly_js() -> bytes:
+    """Returns the plotly.js bundle, read from the plotly package only once."""
+
+    return plotly.offline.get_plotlyjs().encode("utf-8")
+
+
+def write_plotly_asset(assets_dir: Union[str, Path]) -> Path:
+    """
+    Writes the shared plotly.js asset to a directory, unless it is already
+    there. The file name carries the plotly.js version, so outputs made with
+    another version never pick up the wrong bundle.
+
+    Parameters
+    ----------
+    assets_dir : Union[str, Path]
+        Directory of the asset.
+
+    Returns
+    -------
+    Path
+        Path to the asset.
+    """
+
+    asset_path = Path(assets_dir) / PLOTLY_JS_ASSET
+    if asset_path.is_file() and asset_path.stat().st_size == len(plotly_js()):
+        return asset_path
+
+    # Written under a temporary name and renamed, so concurrent runs sharing
+    # the directory never read a partial file
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=assets_dir, suffix=".js")
+    with os.fdopen(file_descriptor, "wb") as file:
+        file.write(plotly_js())
+    os.chmod(temporary_path, 0o644)
+    os.replace(temporary_path, asset_path)
 
+    return asset_path
 
-def generate_html(fig: go.Figure, html_name: str = "sugira.html") -> None:
+
+def generate_html(
+    fig: go.Figure,
+    html_name: Union[str, Path] = "sugira.html",
+    assets_dir: Optional[Union[str, Path]] = None,
+    post_script: Optional[str] = None,
+) -> None:
     """
     Generates a .html file with the plotly code associated.
 
@@ -12,30 +114,78 @@ def generate_html(fig: go.Figure, html_name: str = "sugira.html") -> None:
     ----------
     fig : go.Figure
         Plotly figure.
-    html_name : str
-        .html file name.
+    html_name : Union[str, Path]
+        .html file path.
+    assets_dir : Optional[Union[str, Path]], optional
+        Directory of a shared plotly.js asset that the page references. If
+        None, plotly.js is embedded in the page, by default None.
+    post_script : Optional[str], optional
+        JavaScript run after the plot is drawn, by default None.
     """
 
-    fig.write_html(html_name, full_html=True)
-    with open(html_name, "r") as file:
-        html_content = file.read()
+    include_plotlyjs = True
+    if assets_dir is not None:
+        asset_path = write_plotly_asset(assets_dir)
+        include_plotlyjs = Path(
+            os.path.relpath(asset_path, Path(html_name).parent)
+        ).as_posix()
 
-    style_to_insert = """
-        <style>
-            body {
-                background-color: #1f1b24;
-            }
-        </style>
+    with open(html_name, "w", encoding="utf-8") as file:
+        file.write(figure_html(fig, include_plotlyjs, post_script=post_script))
+
+
+def relayout_script(div_id: str, layout_update: dict) -> str:
+    """
+    Builds a script that updates the layout of a plot already on a page,
+    without loading the page again.
+
+    Parameters
+    ----------
+    div_id : str
+        Id of the plot element.
+    layout_update : dict
+        Layout attributes to replace, as accepted by Plotly.relayout.
+
+    Returns
+    -------
+    str
+        JavaScript code.
+    """
+
+    return f"Plotly.relayout({json.dumps(div_id)}, {to_json_plotly(layout_update)});"
+
+
+def react_traces_script(div_id: str, fig: go.Figure) -> str:
+    """
+    Builds a script that replaces the traces of a plot already on a page with
+    the traces of a figure, keeping the layout of the page (background image,
+    camera, etc).
+
+    Parameters
+    ----------
+    div_id : str
+        Id of the plot element.
+    fig : go.Figure
+        Figure with the new traces.
+
+    Returns
+    -------
+    str
+        JavaScript code.
     """
 
-    html_content = html_content.replace("<head>", "<head>" + style_to_insert)
+    traces = to_json_plotly(fig.to_plotly_json()["data"])
 
-    with open(html_name, "w") as file:
-        file.write(html_content)
+    return (
+        "(function () {"
+        f"var plot = document.getElementById({json.dumps(div_id)});"
+        f"Plotly.react(plot, {traces}, plot.layout);"
+        "})();"
+    )
 
 
 def generate_plan_view_json(
-    fig: go.Figure, json_name: str = "sugira_plan_view.json"
+    fig: go.Figure, json_name: Union[str, Path] = "sugira_plan_view.json"
 ) -> None:
     """
     Generates a .json file to be edited in the plan view.
@@ -44,20 +194,20 @@ def generate_plan_view_json(
     ----------
     fig : go.Figure
         Plotly figure.
-    json_name : str
-        .json file name.
+    json_name : Union[str, Path]
+        .json file path.
     """
     fig.write_json(json_name)
 
 
-def read_from_json(json_name: str = "sugira_plan_view.json") -> go.Figure:
+def read_from_json(json_name: Union[str, Path] = "sugira_plan_view.json") -> go.Figure:
     """
     Read a .json file as plotly figure object.
 
     Parameters
     ----------
-    json_name : str
-        .json file name.
+    json_name : Union[str, Path]
+        .json file path.
 
     Returns
     -------
@@ -1,5 +1,76 @@
-"Generate .txt with exported data"
+"Generate .txt and binary files with exported data"
+from pathlib import Path
+from typing import Dict, Sequence, Union
+
 import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = ("txt", "npz", "parquet", "arrow")
+HEDGEHOG_COLUMNS = ("Time [ms]", "Azimuth", "Intensity", "Elevation")
+W_CHANNEL_COLUMNS = ("Time [ms]", "W Channel")
+
+
+def export_tables(
+    time: np.ndarray,
+    time_w_channel: np.ndarray,
+    w_channel: np.ndarray,
+    intensity: np.ndarray,
+    azimuth: np.ndarray,
+    elevation: np.ndarray,
+) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Builds the columns of the hedgehog and W channel tables.
+
+    Columns of a table are cut to the shortest of them, as the rows of the
+    .txt files always were.
+
+    Returns
+    -------
+    Dict[str, Dict[str, np.ndarray]]
+        Columns keyed by name, for the "hedgehog" and "w_channel" tables.
+    """
+
+    hedgehog_length = min(len(time), len(azimuth), len(intensity), len(elevation))
+    w_channel_length = min(len(time_w_channel), len(w_channel))
+
+    return {
+        "hedgehog": dict(
+            zip(
+                HEDGEHOG_COLUMNS,
+                (
+                    np.asarray(time[:hedgehog_length]),
+                    np.asarray(azimuth[:hedgehog_length]),
+                    np.asarray(intensity[:hedgehog_length]),
+                    np.asarray(elevation[:hedgehog_length]),
+                ),
+            )
+        ),
+        "w_channel": dict(
+            zip(
+                W_CHANNEL_COLUMNS,
+                (
+                    np.round(time_w_channel[:w_channel_length], 3),
+                    np.asarray(w_channel[:w_channel_length]),
+                ),
+            )
+        ),
+    }
+
+
+def write_txt(path: Path, columns: Dict[str, np.ndarray]) -> None:
+    """
+    Writes a table as comma separated text, one row per line.
+
+    Values are formatted with repr, as the row by row writer did, but a whole
+    column at a time.
+    """
+
+    formatted = [map(repr, column.tolist()) for column in columns.values()]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(",".join(columns) + "\n")
+        rows = "\n".join(map(",".join, zip(*formatted)))
+        if rows:
+            file.write(rows + "\n")
 
 
 def export_data(
@@ -9,9 +80,11 @@ def export_data(
     intensity: np.ndarray,
     azimuth: np.ndarray,
     elevation: np.ndarray,
+    output_dir: Union[str, Path] = ".",
+    formats: Sequence[str] = ("txt",),
 ) -> None:
     """
-    Exports intensity, azimuth, and elevation data to a .txt file.
+    Exports intensity, azimuth, elevation and W channel data in the selected formats.
 
     Parameters
     ----------
@@ -27,16 +100,38 @@ def export_data(
         Azimuth array.
     elevation : np.ndarray
         Elevation array.
+    output_dir : Union[str, Path], optional
+        Directory where the files are written, by default the current one.
+    formats : Sequence[str], optional
+        Any of EXPORT_FORMATS: "txt" (hedgehog.txt and w_channel.txt), "npz"
+        (NumPy archives), "parquet" or "arrow" (Arrow IPC). Parquet and Arrow
+        require pyarrow. By default ("txt",).
     """
 
-    with open("hedgehog.txt", "w", encoding="utf-8") as file:
-        file.write("Time [ms],Azimuth,Intensity,Elevation\n")
-        for _, (time_i, intens, azim, elev) in enumerate(
-            zip(time, intensity, azimuth, elevation)
-        ):
-            file.write(f"{time_i},{azim},{intens},{elev}\n")
-
-    with open("w_channel.txt", "w", encoding="utf-8") as file:
-        file.write("Time [ms],W Channel\n")
-        for _, (time_i_w, w) in enumerate(zip(time_w_channel, w_channel)):
-            file.write(f"{np.round(time_i_w, 3)},{w}\n")
+    unknown_formats = set(formats) - set(EXPORT_FORMATS)
+    if unknown_formats:
+        raise ValueError(f"Unknown export formats {sorted(unknown_formats)}")
+
+    output_dir = Path(output_dir)
+    tables = export_tables(
+        time, time_w_channel, w_channel, intensity, azimuth, elevation
+    )
+
+    for table_name, columns in tables.items():
+        if "txt" in formats:
+            write_txt(output_dir / f"{table_name}.txt", columns)
+        if "npz" in formats:
+            # Arrays are named after the columns: "Time [ms]" -> "time"
+            np.savez(
+                output_dir / f"{table_name}.npz",
+                **{
+                    name.split(" [")[0].lower().replace(" ", "_"): column
+                    for name, column in columns.items()
+                },
+            )
+        if "parquet" in formats or "arrow" in formats:
+            data_frame = pd.DataFrame(columns, copy=False)
+            if "parquet" in formats:
+                data_frame.to_parquet(output_dir / f"{table_name}.parquet", index=False)
+            if "arrow" in formats:
+                data_frame.to_feather(output_dir / f"{table_name}.arrow")
@@ -1,12 +1,25 @@
 """Implementations for filtering signals."""
 
+from functools import lru_cache
+from typing import Tuple
+
 import numpy as np
-from scipy.signal import bilinear, firwin, kaiserord, lfilter
+from scipy.fft import irfft, next_fast_len, rfft
+from scipy.signal import (
+    bilinear,
+    firwin,
+    kaiserord,
+    lfilter,
+    sosfilt,
+    zpk2sos,
+)
 
 MIC_CENTER = 1.5
 SOUND_SPEED = 340
 FILTER_TRANSITION_WIDTH_HZ = 250.0
 FILTER_RIPPLE_DB = 60.0
+DECIMATION_TARGET_RATE = 8000
+OVERLAP_ADD_FFT_FACTOR = 8
 
 
 class CapsuleMicsCorrection:
@@ -63,6 +76,38 @@ class CapsuleMicsCorrection:
 
         return array_filtered
 
+    def axis_coefficients(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analog filter of the axis correction.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Numerator and denominator polynomial coefficients.
+        """
+
+        b = np.sqrt(6) * np.array(
+            [1, 1j * (1 / 3) * self.mic_to_center, -(1 / 3) * self.delay_to_center**2]
+        )
+        a = np.array([1, 1j * (1 / 3) * self.delay_to_center])
+
+        return b, a
+
+    def omni_coefficients(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analog filter of the omnidirectional correction.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Numerator and denominator polynomial coefficients.
+        """
+
+        b = np.array([1, 1j * self.delay_to_center, -(1 / 3) * self.delay_to_center**2])
+        a = np.array([1, 1j * (1 / 3) * self.delay_to_center])
+
+        return b, a
+
     def axis_correction(
         self,
         axis_signal: np.ndarray,
@@ -81,11 +126,7 @@ class CapsuleMicsCorrection:
             Corrected signal.
         """
 
-        b = np.sqrt(6) * np.array(
-            [1, 1j * (1 / 3) * self.mic_to_center, -(1 / 3) * self.delay_to_center**2]
-        )
-        a = np.array([1, 1j * (1 / 3) * self.delay_to_center])
-        axis_corrected = self._filter(b, a, axis_signal)
+        axis_corrected = self._filter(*self.axis_coefficients(), axis_signal)
 
         return axis_corrected
 
@@ -107,13 +148,285 @@ class CapsuleMicsCorrection:
             Corrected signal.
         """
 
-        a = np.array([1, 1j * (1 / 3) * self.delay_to_center])
-        b = np.array([1, 1j * self.delay_to_center, -(1 / 3) * self.delay_to_center**2])
-        omni_corrected = self._filter(b, a, omni_signal)
+        omni_corrected = self._filter(*self.omni_coefficients(), omni_signal)
 
         return omni_corrected
 
 
+def real_part_sos(b: np.ndarray, a: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Designs the real coefficients digital filter whose impulse response is the
+    real part of that of a complex coefficients analog filter, discretized
+    with the bilinear transform.
+
+    Filtering a real signal and keeping the real part of the output is then
+    done without complex arithmetic. The analog filter is (H + H*) / 2, that
+    is (b a* + b* a) / (2 a a*), where * conjugates the coefficients.
+
+    The corrections have poles on the imaginary axis, very close to DC, so
+    the poles are mapped one by one instead of found from the expanded
+    polynomials, whose roots would be off the unit circle by rounding.
+
+    Parameters
+    ----------
+    b : np.ndarray
+        Numerator polynomial coefficients of the analog filter.
+    a : np.ndarray
+        Denominator polynomial coefficients of the analog filter.
+    sample_rate : int
+        Sample rate in Hz.
+
+    Returns
+    -------
+    np.ndarray
+        Second-order sections.
+    """
+
+    numerator = (np.convolve(b, a.conj()) + np.convolve(b.conj(), a)).real / 2
+    numerator = np.trim_zeros(numerator, "f")
+    a_roots = np.roots(a)
+
+    zeros = np.roots(numerator)
+    poles = np.concatenate([a_roots, a_roots.conj()])
+    gain = numerator[0] / np.abs(a[0]) ** 2
+
+    # Bilinear transform of every zero and pole. Zeros in excess of the poles
+    # come with poles at Nyquist.
+    fs2 = 2 * sample_rate
+    zeros_digital = (fs2 + zeros) / (fs2 - zeros)
+    poles_digital = np.append(
+        (fs2 + poles) / (fs2 - poles), -np.ones(len(zeros) - len(poles))
+    )
+    gain_digital = gain * np.real(np.prod(fs2 - zeros) / np.prod(fs2 - poles))
+
+    return zpk2sos(zeros_digital, poles_digital, gain_digital)
+
+
+class CapsuleCorrectionFilterBank:
+    """
+    The capsule corrections of CapsuleMicsCorrection, designed once as real
+    second-order sections and applied to B-format signals.
+
+    Parameters
+    ----------
+    sample_rate : int
+        Sample rate in Hz.
+    mic_to_center : float, optional
+        Distance from microphone to center in cm, by default MIC_CENTER.
+    sound_speed : float, optional
+        Speed of sound in m/s, by default SOUND_SPEED.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        mic_to_center: float = MIC_CENTER,
+        sound_speed: float = SOUND_SPEED,
+    ) -> None:
+        corrector = CapsuleMicsCorrection(sample_rate, mic_to_center, sound_speed)
+        self.omni_sos = real_part_sos(*corrector.omni_coefficients(), sample_rate)
+        self.axis_sos = real_part_sos(*corrector.axis_coefficients(), sample_rate)
+
+    def process(self, bformat_signals: np.ndarray) -> np.ndarray:
+        """
+        Applies the omnidirectional correction to W and the axis correction to
+        X, Y and Z.
+
+        Parameters
+        ----------
+        bformat_signals : np.ndarray
+            B-format signals with shape (4, samples), W channel first.
+
+        Returns
+        -------
+        np.ndarray
+            Corrected B-format signals, the real part of what the complex
+            corrections of CapsuleMicsCorrection give.
+        """
+
+        # sosfilt runs the recursion in double precision, which the poles on
+        # the unit circle need, but single precision signals are kept so
+        bformat_corrected = np.empty(
+            bformat_signals.shape, dtype=np.result_type(bformat_signals, np.float32)
+        )
+        # The W and the axes filters differ, and sosfilt applies one filter to
+        # every channel, so the three axes go in one call and W in another
+        bformat_corrected[0, :] = sosfilt(self.omni_sos, bformat_signals[0, :])
+        bformat_corrected[1:, :] = sosfilt(self.axis_sos, bformat_signals[1:, :])
+
+        return bformat_corrected
+
+
+@lru_cache(maxsize=None)
+def capsule_correction_bank(
+    sample_rate: int,
+    mic_to_center: float = MIC_CENTER,
+    sound_speed: float = SOUND_SPEED,
+) -> CapsuleCorrectionFilterBank:
+    """
+    Returns the capsule correction filter bank of a sample rate. Banks are
+    cached, so repeated analyses never redesign the same filters.
+
+    Parameters
+    ----------
+    sample_rate : int
+        Sample rate in Hz.
+    mic_to_center : float, optional
+        Distance from microphone to center in cm, by default MIC_CENTER.
+    sound_speed : float, optional
+        Speed of sound in m/s, by default SOUND_SPEED.
+
+    Returns
+    -------
+    CapsuleCorrectionFilterBank
+        Filter bank, safe to share between threads as its filters are never
+        modified. They aren't flagged read-only because sosfilt rejects
+        read-only sections.
+    """
+
+    return CapsuleCorrectionFilterBank(sample_rate, mic_to_center, sound_speed)
+
+
+@lru_cache(maxsize=None)
+def low_pass_coefficients(
+    cutoff_frec: int,
+    sample_rate: int,
+    transition_width: float = FILTER_TRANSITION_WIDTH_HZ,
+    ripple_db: float = FILTER_RIPPLE_DB,
+) -> np.ndarray:
+    """
+    Designs the Kaiser-window FIR coefficients of the low-pass filter.
+
+    Designs are cached, so repeated analyses never redesign the same filter.
+
+    Parameters
+    ----------
+    cutoff_frec : int
+        Cutoff frequency in Hz.
+    sample_rate : int
+        Sample rate in Hz.
+    transition_width : float, optional
+        Transition band width in Hz, by default FILTER_TRANSITION_WIDTH_HZ.
+    ripple_db : float, optional
+        Stopband attenuation in dB, by default FILTER_RIPPLE_DB.
+
+    Returns
+    -------
+    np.ndarray
+        Read-only FIR filter coefficients.
+    """
+
+    nyquist = sample_rate / 2.0
+
+    # Compute FIR filter parameters.
+    transition_width_normalized = transition_width / nyquist
+    filter_length, filter_beta = kaiserord(ripple_db, transition_width_normalized)
+    filter_coefficients = firwin(
+        filter_length, cutoff_frec / nyquist, window=("kaiser", filter_beta)
+    )
+    filter_coefficients.setflags(write=False)
+
+    return filter_coefficients
+
+
+@lru_cache(maxsize=None)
+def low_pass_spectrum(
+    cutoff_frec: int,
+    sample_rate: int,
+    transition_width: float = FILTER_TRANSITION_WIDTH_HZ,
+    ripple_db: float = FILTER_RIPPLE_DB,
+) -> Tuple[int, np.ndarray]:
+    """
+    Computes the frequency response of the low-pass filter used by the
+    overlap-add convolution. Spectra are cached like the filter designs.
+
+    Parameters
+    ----------
+    cutoff_frec : int
+        Cutoff frequency in Hz.
+    sample_rate : int
+        Sample rate in Hz.
+    transition_width : float, optional
+        Transition band width in Hz, by default FILTER_TRANSITION_WIDTH_HZ.
+    ripple_db : float, optional
+        Stopband attenuation in dB, by default FILTER_RIPPLE_DB.
+
+    Returns
+    -------
+    Tuple[int, np.ndarray]
+        FFT length of each overlap-add block and the read-only filter spectrum.
+    """
+
+    filter_coefficients = low_pass_coefficients(
+        cutoff_frec, sample_rate, transition_width, ripple_db
+    )
+    fft_length = next_fast_len(
+        OVERLAP_ADD_FFT_FACTOR * len(filter_coefficients), real=True
+    )
+    filter_spectrum = rfft(filter_coefficients, fft_length)
+    filter_spectrum.setflags(write=False)
+
+    return fft_length, filter_spectrum
+
+
+def overlap_add(
+    signal: np.ndarray,
+    filter_spectrum: np.ndarray,
+    filter_length: int,
+    fft_length: int,
+) -> np.ndarray:
+    """
+    Filters a signal with an FIR filter by FFT overlap-add.
+
+    All channels and blocks are transformed in one batched FFT. The output is
+    truncated to the signal length, like lfilter.
+
+    Parameters
+    ----------
+    signal : np.ndarray
+        Input signal, with time along the last axis.
+    filter_spectrum : np.ndarray
+        Real FFT of the filter coefficients with length fft_length.
+    filter_length : int
+        Number of filter coefficients.
+    fft_length : int
+        FFT length of each block.
+
+    Returns
+    -------
+    np.ndarray
+        Filtered signal.
+    """
+
+    block_length = fft_length - filter_length + 1
+    signal_length = signal.shape[-1]
+    blocks_count = -(-signal_length // block_length)
+    channels_shape = signal.shape[:-1]
+
+    # Blocks are transformed in the precision of the filter spectrum
+    signal_blocks = np.zeros(
+        channels_shape + (blocks_count * block_length,),
+        dtype=np.result_type(signal, filter_spectrum.real),
+    )
+    signal_blocks[..., :signal_length] = signal
+    signal_blocks = signal_blocks.reshape(channels_shape + (blocks_count, block_length))
+
+    filtered_blocks = irfft(
+        rfft(signal_blocks, fft_length, axis=-1) * filter_spectrum,
+        fft_length,
+        axis=-1,
+    )
+
+    # Each block spills its filter tail over the start of the next one
+    output = np.zeros(
+        channels_shape + (blocks_count + 1, block_length), dtype=filtered_blocks.dtype
+    )
+    output[..., :-1, :] = filtered_blocks[..., :block_length]
+    output[..., 1:, : filter_length - 1] += filtered_blocks[..., block_length:]
+
+    return output.reshape(channels_shape + (-1,))[..., :signal_length]
+
+
 def low_pass_filter(
     signal: np.ndarray,
     cutoff_frec: int,
@@ -137,18 +450,84 @@ def low_pass_filter(
         Filtered signal.
     """
 
-    nyquist = sample_rate / 2.0
+    filter_length = len(low_pass_coefficients(cutoff_frec, sample_rate))
+    fft_length, filter_spectrum = low_pass_spectrum(cutoff_frec, sample_rate)
 
-    # Compute FIR filter parameters and apply to signal.
-    transition_width_normalized = FILTER_TRANSITION_WIDTH_HZ / nyquist
-    filter_length, filter_beta = kaiserord(
-        FILTER_RIPPLE_DB, transition_width_normalized
-    )
-    filter_coefficients = firwin(
-        filter_length, cutoff_frec / nyquist, window=("kaiser", filter_beta)
+    # The FFT rounding error follows the loudest sample of each block, which
+    # in single precision would reach the late reflections, so the filter
+    # always runs in double precision and only its output is single precision
+    signal_filtered = overlap_add(signal, filter_spectrum, filter_length, fft_length)
+
+    return signal_filtered.astype(np.result_type(signal, np.float32), copy=False)
+
+
+def decimation_factor(
+    cutoff_frec: int,
+    sample_rate: int,
+) -> int:
+    """
+    Computes the downsampling factor that can follow the low-pass filter.
+
+    The reduced sample rate stays above DECIMATION_TARGET_RATE, so short
+    integration windows keep enough samples, and its Nyquist frequency stays
+    above the filter stopband, so no aliasing is introduced.
+
+    Parameters
+    ----------
+    cutoff_frec : int
+        Cutoff frequency in Hz.
+    sample_rate : int
+        Sample rate in Hz.
+
+    Returns
+    -------
+    int
+        Decimation factor, 1 if the signal cannot be downsampled.
+    """
+
+    alias_free_factor = int(
+        sample_rate // (2 * (cutoff_frec + FILTER_TRANSITION_WIDTH_HZ))
     )
+    target_factor = int(sample_rate // DECIMATION_TARGET_RATE)
+
+    return max(1, min(alias_free_factor, target_factor))
 
-    return lfilter(filter_coefficients, 1.0, signal)
+
+def low_pass_decimate(
+    signal: np.ndarray,
+    cutoff_frec: int,
+    sample_rate: int,
+    factor: int,
+) -> np.ndarray:
+    """
+    Applies the low-pass filter and downsamples the signal.
+
+    The signal is filtered at its full rate by the cached overlap-add filter
+    of low_pass_filter, and every factor-th sample is kept. At the lengths of
+    the low-pass filter this is faster than computing only the kept samples in
+    direct form.
+
+    Parameters
+    ----------
+    signal : np.ndarray
+        Input signal to be filtered, with time along the last axis.
+    cutoff_frec : int
+        Cutoff frequency in Hz.
+    sample_rate : int
+        Sample rate in Hz.
+    factor : int
+        Decimation factor.
+
+    Returns
+    -------
+    np.ndarray
+        Filtered signal sampled at sample_rate / factor.
+    """
+
+    # A copy, so the full rate signal is released
+    return np.ascontiguousarray(
+        low_pass_filter(signal, cutoff_frec, sample_rate)[..., ::factor]
+    )
 
 
 def moving_average(
@@ -158,6 +537,11 @@ def moving_average(
     """
     Applies a moving average filter to the input array.
 
+    The window sums are differences of a cumulative sum, so the cost doesn't
+    depend on window_size. The sum is accumulated in float64 over the array
+    minus its mean, which keeps the rounding error of the differences at the
+    scale of the signal around its mean rather than of the running total.
+
     Parameters
     ----------
     array : np.ndarray
@@ -168,9 +552,19 @@ def moving_average(
     Returns
     -------
     np.ndarray
-        Filtered array.
+        Filtered array, with the len(array) - window_size + 1 samples where the
+        window fits in the array.
     """
 
-    window = np.ones(window_size) / window_size
+    if window_size < 1 or window_size > len(array):
+        window = np.ones(window_size) / window_size
+        return np.convolve(array, window, mode="valid")
+
+    mean = np.mean(array, dtype=np.float64)
+    cumulative_sum = np.empty(len(array) + 1)
+    cumulative_sum[0] = 0
+    np.cumsum(np.subtract(array, mean, dtype=np.float64), out=cumulative_sum[1:])
+
+    window_sums = cumulative_sum[window_size:] - cumulative_sum[:-window_size]
 
-    return np.convolve(array, window, mode="valid")
+    return window_sums / window_size + mean
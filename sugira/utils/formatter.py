@@ -1,106 +1,138 @@
 from functools import singledispatch
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 import numpy as np
-
-
-@singledispatch
-def convert_ambisonics_a_to_b(
-    front_left_up: np.ndarray,
-    front_right_down: np.ndarray,
-    back_right_up: np.ndarray,
-    back_left_down: np.ndarray,
+from numpy.typing import ArrayLike
+
+
+# Capsule order of the rows of A-format signals
+A_FORMAT_CHANNELS = (
+    "front_left_up",
+    "front_right_down",
+    "back_right_up",
+    "back_left_down",
+)
+
+# W, X, Y and Z rows, one column per capsule of a tetrahedral array
+A_TO_B_MATRIX = np.array(
+    [
+        [1, 1, 1, 1],
+        [1, 1, -1, -1],
+        [1, -1, -1, 1],
+        [1, -1, 1, -1],
+    ],
+    dtype=np.float64,
+)
+A_TO_B_MATRIX.setflags(write=False)
+
+
+def encoding_matrix(
+    matrix: Optional[ArrayLike] = None,
+    capsule_gains: Optional[ArrayLike] = None,
 ) -> np.ndarray:
     """
-    Converts Ambisonics A-format to B-format.
+    Builds the matrix that encodes A-format signals into B-format.
 
     Parameters
     ----------
-    front_left_up : np.ndarray
-        Front left up channel.
-    front_right_down : np.ndarray
-        Front right down channel.
-    back_right_up : np.ndarray
-        Back right up channel.
-    back_left_down : np.ndarray
-        Back left down channel.
+    matrix : Optional[ArrayLike], optional
+        Encoding matrix with 4 rows (W, X, Y and Z) and one column per capsule,
+        for arrays other than the standard tetrahedral one. By default
+        A_TO_B_MATRIX.
+    capsule_gains : Optional[ArrayLike], optional
+        Linear gain trim of each capsule, applied to its column, by default None.
 
     Returns
     -------
     np.ndarray
-        Converted B-format channels.
+        Encoding matrix with shape (4, capsules).
     """
 
-    w_channel = front_left_up + front_right_down + back_left_down + back_right_up
-    x_channel = front_left_up + front_right_down - back_left_down - back_right_up
-    y_channel = front_left_up - front_right_down + back_left_down - back_right_up
-    z_channel = front_left_up - front_right_down - back_left_down + back_right_up
+    matrix = A_TO_B_MATRIX if matrix is None else np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[0] != 4:
+        raise ValueError(f"Encoding matrix must have 4 rows, not shape {matrix.shape}")
 
-    b_format = np.array([w_channel, x_channel, y_channel, z_channel])
+    if capsule_gains is not None:
+        matrix = matrix * np.asarray(capsule_gains, dtype=np.float64)
 
-    return b_format
+    return matrix
 
 
-@convert_ambisonics_a_to_b.register(dict)
-def _(a_format_channels: dict) -> np.ndarray:
+@singledispatch
+def convert_ambisonics_a_to_b(
+    a_format_channels: np.ndarray,
+    *more_channels: np.ndarray,
+    matrix: Optional[ArrayLike] = None,
+    capsule_gains: Optional[ArrayLike] = None,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
     """
-    Converts Ambisonics A-format to B-format using a dictionary input.
+    Converts Ambisonics A-format to B-format.
+
+    Every input type is stacked into one array with a row per capsule, in the
+    order of A_FORMAT_CHANNELS, and encoded with a single matrix product.
 
     Parameters
     ----------
-    a_format_channels : dict
-        Dictionary containing the A-format channels.
+    a_format_channels : np.ndarray
+        A-format signals with one row per capsule, or the front left up
+        channel if the other capsules are given in more_channels.
+    *more_channels : np.ndarray
+        Front right down, back right up and back left down channels, when
+        a_format_channels is a single channel.
+    matrix : Optional[ArrayLike], optional
+        Encoding matrix with 4 rows and one column per capsule, by default
+        A_TO_B_MATRIX.
+    capsule_gains : Optional[ArrayLike], optional
+        Linear gain trim of each capsule, by default None.
+    out : Optional[np.ndarray], optional
+        Array with shape (4, samples) where the B-format signals are written,
+        by default a new one.
 
     Returns
     -------
     np.ndarray
-        Converted B-format channels.
+        Converted B-format channels, W, X, Y and Z.
     """
 
-    back_left_down = a_format_channels["back_left_down"]
-    back_right_up = a_format_channels["back_right_up"]
-    front_left_up = a_format_channels["front_left_up"]
-    front_right_down = a_format_channels["front_right_down"]
+    if more_channels:
+        a_format_channels = np.stack((a_format_channels,) + more_channels)
 
-    w_channel = front_left_up + front_right_down + back_left_down + back_right_up
-    x_channel = front_left_up + front_right_down - back_left_down - back_right_up
-    y_channel = front_left_up - front_right_down + back_left_down - back_right_up
-    z_channel = front_left_up - front_right_down - back_left_down + back_right_up
+    matrix = encoding_matrix(matrix, capsule_gains)
+    if a_format_channels.ndim != 2 or a_format_channels.shape[0] != matrix.shape[1]:
+        raise ValueError(
+            f"Conversion from A-format to B-format requires {matrix.shape[1]} "
+            f"channels, not shape {a_format_channels.shape}"
+        )
 
-    b_format = np.array([w_channel, x_channel, y_channel, z_channel])
+    # Single precision signals are encoded in single precision
+    dtype = np.result_type(a_format_channels.dtype, np.float32)
+    if out is None:
+        out = np.empty((4, a_format_channels.shape[1]), dtype=dtype)
 
-    return b_format
+    return np.matmul(matrix.astype(dtype, copy=False), a_format_channels, out=out)
 
 
-@convert_ambisonics_a_to_b.register(list)
-def _(a_format_channels: List[np.ndarray]) -> np.ndarray:
+@convert_ambisonics_a_to_b.register(dict)
+def _(a_format_channels: dict, **kwargs) -> np.ndarray:
     """
-    Converts Ambisonics A-format to B-format using a list input.
-
-    Parameters
-    ----------
-    a_format_channels : List[np.ndarray]
-        List containing the A-format channels.
-
-    Returns
-    -------
-    np.ndarray
-        Converted B-format channels.
+    Converts Ambisonics A-format to B-format using a dictionary input, with
+    the channels keyed as in A_FORMAT_CHANNELS.
     """
 
-    assert (
-        len(a_format_channels) == 4
-    ), "Conversion from A-format to B-format requires 4 channels"
+    return convert_ambisonics_a_to_b(
+        np.stack([a_format_channels[key] for key in A_FORMAT_CHANNELS]), **kwargs
+    )
 
-    back_left_down = a_format_channels[3]
-    back_right_up = a_format_channels[2]
-    front_left_up = a_format_channels[0]
-    front_right_down = a_format_channels[1]
 
-    b_format = convert_ambisonics_a_to_b.dispatch(np.ndarray)(
-        front_left_up, front_right_down, back_right_up, back_left_down
-    )
+@convert_ambisonics_a_to_b.register(list)
+@convert_ambisonics_a_to_b.register(tuple)
+def _(a_format_channels: List[np.ndarray], **kwargs) -> np.ndarray:
+    """
+    Converts Ambisonics A-format to B-format using a list input, with the
+    channels in the order of A_FORMAT_CHANNELS.
+    """
 
-    return b_format
+    return convert_ambisonics_a_to_b(np.stack(a_format_channels), **kwargs)
 
 
 def cartesian_to_spherical(intensity_windowed: np.ndarray):
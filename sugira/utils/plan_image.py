@@ -0,0 +1,160 @@
+"""Decoding, downscaling and encoding of plan images for the Plan View section."""
+
+import base64
+import hashlib
+import io
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+from utils.audio_stack import file_signature
+
+PLAN_DISPLAY_SIZE = (1250, 600)
+PLAN_IMAGE_CACHE_SIZE = 8
+JPEG_QUALITY = 90
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """
+    Hashes the content of a file.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Path to the file.
+
+    Returns
+    -------
+    str
+        Hexadecimal BLAKE2b digest.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024**2), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def encode_plan_image(
+    path: Union[str, Path], max_size: Optional[Tuple[int, int]] = PLAN_DISPLAY_SIZE
+) -> Tuple[bytes, str]:
+    """
+    Encodes a plan image to be embedded in a page.
+
+    Images larger than max_size are downscaled to fit it. Images with
+    transparency are encoded as PNG and the rest as JPEG. Images already
+    within max_size in a format browsers can show are kept as they are.
+
+    Parameters
+    ----------
+    path : Union[str, Path]
+        Path to the plan image.
+    max_size : Optional[Tuple[int, int]], optional
+        Maximum width and height in pixels. If None, the image keeps its full
+        resolution, by default PLAN_DISPLAY_SIZE.
+
+    Returns
+    -------
+    Tuple[bytes, str]
+        Encoded image and its MIME type.
+    """
+
+    with Image.open(path) as image:
+        image_format = image.format
+        fits = max_size is None or (
+            image.width <= max_size[0] and image.height <= max_size[1]
+        )
+        exif_orientation = image.getexif().get(0x0112, 1)
+        if fits and exif_orientation == 1 and image_format in ("PNG", "JPEG", "WEBP"):
+            return Path(path).read_bytes(), Image.MIME[image_format]
+
+        image = ImageOps.exif_transpose(image)
+        if max_size is not None:
+            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+
+        image.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY)
+        return buffer.getvalue(), "image/jpeg"
+
+
+class PlanImageCache:
+    """
+    Least recently used cache of plan images encoded as data URIs, keyed by
+    the image content and the maximum size.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Number of encoded images kept in memory, by default PLAN_IMAGE_CACHE_SIZE.
+    """
+
+    def __init__(self, max_entries: int = PLAN_IMAGE_CACHE_SIZE) -> None:
+        self.max_entries = max_entries
+        self._digests = {}
+        self._data_uris = OrderedDict()
+        self._lock = Lock()
+
+    def digest(self, path: Union[str, Path]) -> str:
+        """Hashes a file, only once while it doesn't change on disk."""
+
+        signature = file_signature(path)
+        with self._lock:
+            if signature in self._digests:
+                return self._digests[signature]
+
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[signature] = digest
+
+        return digest
+
+    def data_uri(
+        self,
+        path: Union[str, Path],
+        max_size: Optional[Tuple[int, int]] = PLAN_DISPLAY_SIZE,
+    ) -> str:
+        """
+        Returns a plan image as a data URI, encoding it only once.
+
+        Parameters
+        ----------
+        path : Union[str, Path]
+            Path to the plan image.
+        max_size : Optional[Tuple[int, int]], optional
+            Maximum width and height in pixels. If None, the image keeps its
+            full resolution, by default PLAN_DISPLAY_SIZE.
+
+        Returns
+        -------
+        str
+            Data URI with the encoded image.
+        """
+
+        key = (self.digest(path), max_size)
+        with self._lock:
+            if key in self._data_uris:
+                self._data_uris.move_to_end(key)
+                return self._data_uris[key]
+
+        content, mime_type = encode_plan_image(path, max_size)
+        data_uri = f"data:{mime_type};base64,{base64.b64encode(content).decode()}"
+
+        with self._lock:
+            self._data_uris[key] = data_uri
+            while len(self._data_uris) > self.max_entries:
+                self._data_uris.popitem(last=False)
+
+        return data_uri
+
+
+PLAN_IMAGES = PlanImageCache()
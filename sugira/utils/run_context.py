@@ -0,0 +1,102 @@
+"""Output location of a single analysis run."""
+
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+HTML_NAME = "sugira.html"
+PLAN_VIEW_JSON_NAME = "sugira_plan_view.json"
+HEDGEHOG_TXT_NAME = "hedgehog.txt"
+W_CHANNEL_TXT_NAME = "w_channel.txt"
+
+
+@dataclass(frozen=True)
+class RunContext:
+    """
+    Directory where one analysis writes its outputs, so concurrent runs never
+    overwrite each other.
+
+    Parameters
+    ----------
+    output_dir : Path
+        Directory of the run outputs.
+    temporary : bool, optional
+        Whether the directory was created for this run and can be removed,
+        by default False.
+    assets_dir : Optional[Path], optional
+        Directory of the plotly.js asset shared by the .html outputs. If None,
+        every .html embeds plotly.js, by default None.
+    """
+
+    output_dir: Path
+    temporary: bool = False
+    assets_dir: Optional[Path] = None
+
+    @classmethod
+    def create(
+        cls,
+        output_dir: Optional[Union[str, Path]] = None,
+        assets_dir: Optional[Union[str, Path]] = None,
+    ) -> "RunContext":
+        """
+        Creates the output directory of a run.
+
+        Parameters
+        ----------
+        output_dir : Optional[Union[str, Path]], optional
+            Directory for the outputs. If None, a new temporary directory is
+            used, by default None.
+        assets_dir : Optional[Union[str, Path]], optional
+            Directory of the shared plotly.js asset. If None, plotly.js is
+            embedded in every .html, by default None.
+
+        Returns
+        -------
+        RunContext
+            Context of the run.
+        """
+
+        if assets_dir is not None:
+            assets_dir = Path(assets_dir)
+            assets_dir.mkdir(parents=True, exist_ok=True)
+
+        if output_dir is None:
+            return cls(
+                Path(tempfile.mkdtemp(prefix="sugira_")),
+                temporary=True,
+                assets_dir=assets_dir,
+            )
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        return cls(output_dir, assets_dir=assets_dir)
+
+    def path(self, name: str) -> Path:
+        """Returns the path of an output file of the run."""
+
+        return self.output_dir / name
+
+    @property
+    def html_path(self) -> Path:
+        return self.path(HTML_NAME)
+
+    @property
+    def plan_view_json_path(self) -> Path:
+        return self.path(PLAN_VIEW_JSON_NAME)
+
+    @property
+    def hedgehog_txt_path(self) -> Path:
+        return self.path(HEDGEHOG_TXT_NAME)
+
+    @property
+    def w_channel_txt_path(self) -> Path:
+        return self.path(W_CHANNEL_TXT_NAME)
+
+    def cleanup(self) -> None:
+        """Removes the output directory if it was created for this run."""
+
+        if self.temporary:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
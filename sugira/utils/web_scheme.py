@@ -0,0 +1,92 @@
+"""In-memory delivery of plotly pages to the GUI web views."""
+
+from threading import Lock
+
+from PyQt5 import QtCore
+from PyQt5.QtWebEngineCore import (
+    QWebEngineUrlRequestJob,
+    QWebEngineUrlScheme,
+    QWebEngineUrlSchemeHandler,
+)
+
+from utils.embed_files import PLOTLY_JS_ASSET, plotly_js
+
+SCHEME = b"sugira"
+HOST = "app"
+PLOTLY_JS_URL = f"{SCHEME.decode()}://{HOST}/{PLOTLY_JS_ASSET}"
+
+
+def register_scheme() -> None:
+    """
+    Registers the sugira:// scheme. It must be called before the
+    QApplication is created.
+    """
+
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(
+        QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalAccessAllowed
+    )
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class FigureSchemeHandler(QWebEngineUrlSchemeHandler):
+    """
+    Serves published .html pages and plotly.js from memory under sugira://,
+    so showing a figure doesn't write or read any file.
+
+    Pages reference plotly.js through PLOTLY_JS_URL, so the bundle is kept
+    once and shared by every page.
+    """
+
+    def __init__(self, parent: QtCore.QObject = None) -> None:
+        super().__init__(parent)
+        self._pages = {}
+        self._versions = {}
+        self._lock = Lock()
+
+    def publish(self, name: str, html_content: str) -> QtCore.QUrl:
+        """
+        Publishes a page, replacing the previous page with the same name.
+
+        Parameters
+        ----------
+        name : str
+            Page name.
+        html_content : str
+            .html page, referencing plotly.js through PLOTLY_JS_URL.
+
+        Returns
+        -------
+        QtCore.QUrl
+            URL of the page. It changes on every publication, so views never
+            show a stale copy.
+        """
+
+        with self._lock:
+            self._pages[name] = html_content.encode("utf-8")
+            self._versions[name] = self._versions.get(name, 0) + 1
+            version = self._versions[name]
+
+        return QtCore.QUrl(f"{SCHEME.decode()}://{HOST}/{name}.html?v={version}")
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob) -> None:
+        name = job.requestUrl().path().lstrip("/")
+
+        content = None
+        if name == PLOTLY_JS_ASSET:
+            content, content_type = plotly_js(), b"application/javascript"
+        elif name.endswith(".html"):
+            with self._lock:
+                content = self._pages.get(name[: -len(".html")])
+            content_type = b"text/html"
+
+        if content is None:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+
+        # The buffer is owned by the job and released with it
+        buffer = QtCore.QBuffer(job)
+        buffer.setData(content)
+        buffer.open(QtCore.QIODevice.ReadOnly)
+        job.reply(content_type, buffer)
@@ -0,0 +1,176 @@
+"""Synthetic Ambisonics measurements shared by the tests."""
+
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pytest
+import soundfile as sf
+from scipy.signal import butter, fftconvolve, sosfiltfilt
+
+from engine.input import InputFormat
+from utils.formatter import A_FORMAT_CHANNELS, A_TO_B_MATRIX
+
+SAMPLE_RATE = 48000
+IR_LENGTH = 0.8
+DIRECT_SOUND_TIME = 0.1
+REFLECTIONS_COUNT = 60
+NOISE_LEVEL = 1e-5
+SWEEP_LENGTH = 1.0
+SWEEP_FREQUENCIES = (20, 20000)
+ANTI_ALIASING_BANDWIDTH = 20000
+ANTI_ALIASING_ORDER = 8
+
+SIGNAL_PARAMETERS = {
+    "integration_time": 1e-3,
+    "analysis_length": 0.3,
+    "intensity_threshold": -60,
+    "low_pass_key": True,
+    "plot_energy": True,
+    "time_colorscale": True,
+}
+
+
+def bformat_impulse_response(
+    length: float = IR_LENGTH, seed: int = 0, sample_rate: int = SAMPLE_RATE
+) -> np.ndarray:
+    """
+    Builds a full-band B-format impulse response: a direct sound at
+    DIRECT_SOUND_TIME followed by decaying reflections from random directions,
+    each a single sample, over a low noise floor.
+
+    Returns
+    -------
+    np.ndarray
+        W, X, Y and Z channels with shape (4, samples).
+    """
+
+    rng = np.random.default_rng(seed)
+    direct_sound_idx = int(DIRECT_SOUND_TIME * sample_rate)
+
+    arrivals = np.concatenate(
+        [
+            [direct_sound_idx],
+            np.sort(
+                rng.integers(
+                    direct_sound_idx + sample_rate // 500,
+                    direct_sound_idx + sample_rate // 2,
+                    REFLECTIONS_COUNT,
+                )
+            ),
+        ]
+    )
+    delays = (arrivals - direct_sound_idx) / sample_rate
+    amplitudes = 0.5 * np.exp(-delays / 0.1) * rng.uniform(0.3, 1, len(arrivals))
+    amplitudes[0] = 0.5
+    azimuths = rng.uniform(-np.pi, np.pi, len(arrivals))
+    elevations = rng.uniform(-np.pi / 3, np.pi / 3, len(arrivals))
+
+    bformat = rng.normal(0, NOISE_LEVEL, (4, int(length * sample_rate)))
+    directions = np.array(
+        [
+            np.ones_like(azimuths),
+            np.cos(azimuths) * np.cos(elevations),
+            np.sin(azimuths) * np.cos(elevations),
+            np.sin(elevations),
+        ]
+    )
+    np.add.at(bformat, (slice(None), arrivals), directions * amplitudes)
+
+    return bformat
+
+
+def band_limit(
+    signals: np.ndarray, bandwidth: float, sample_rate: int = SAMPLE_RATE
+) -> np.ndarray:
+    """Zero phase low-pass filter, like the anti-aliasing filter of a recorder."""
+
+    sos = butter(ANTI_ALIASING_ORDER, bandwidth, fs=sample_rate, output="sos")
+
+    return sosfiltfilt(sos, signals)
+
+
+def bformat_to_aformat(bformat: np.ndarray) -> np.ndarray:
+    """Capsule signals that A_TO_B_MATRIX encodes back into bformat."""
+
+    return A_TO_B_MATRIX.T @ bformat / 4
+
+
+def exponential_sweep(sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Exponential sine sweep over SWEEP_FREQUENCIES."""
+
+    start, stop = SWEEP_FREQUENCIES
+    time = np.arange(int(SWEEP_LENGTH * sample_rate)) / sample_rate
+    rate = np.log(stop / start)
+
+    phase = start * SWEEP_LENGTH / rate * (np.exp(time * rate / SWEEP_LENGTH) - 1)
+
+    return np.sin(2 * np.pi * phase)
+
+
+def inverse_sweep(sweep: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Time reversed sweep with the amplitude decay that flattens its spectrum."""
+
+    start, stop = SWEEP_FREQUENCIES
+    time = np.arange(len(sweep)) / sample_rate
+    inverse = sweep[::-1] * np.exp(-time * np.log(stop / start) / SWEEP_LENGTH)
+
+    return inverse / np.max(np.abs(fftconvolve(sweep, inverse)))
+
+
+@pytest.fixture(name="aformat_measurement")
+def fixture_aformat_measurement(tmp_path: Path) -> Callable[..., dict]:
+    """Writes a 4-channel A-format .wav and returns a factory of its input dict."""
+
+    def write(
+        length: float = IR_LENGTH, seed: int = 0, bandwidth: Optional[float] = None
+    ) -> dict:
+        path = tmp_path / f"aformat_{seed}_{length}_{bandwidth}.wav"
+        bformat = bformat_impulse_response(length, seed)
+        if bandwidth is not None:
+            bformat = band_limit(bformat, bandwidth)
+        aformat = bformat_to_aformat(bformat)
+        sf.write(path, aformat.T, SAMPLE_RATE, subtype="PCM_24")
+
+        return {
+            "input_mode": InputFormat.AFORMAT,
+            "channels_per_file": 4,
+            "frequency_correction": True,
+            "stacked_signals": str(path),
+        }
+
+    return write
+
+
+@pytest.fixture(name="lss_measurement")
+def fixture_lss_measurement(tmp_path: Path) -> Callable[..., dict]:
+    """Writes sweep recordings of every capsule and the inverse filter, and
+    returns a factory of their input dict."""
+
+    def write(seed: int = 0, bandwidth: Optional[float] = None) -> dict:
+        sweep = exponential_sweep()
+        bformat = bformat_impulse_response(seed=seed)
+        if bandwidth is not None:
+            bformat = band_limit(bformat, bandwidth)
+        aformat = bformat_to_aformat(bformat)
+
+        input_dict = {
+            "input_mode": InputFormat.LSS,
+            "channels_per_file": 1,
+            "frequency_correction": True,
+        }
+        for channel, impulse_response in zip(A_FORMAT_CHANNELS, aformat):
+            path = tmp_path / f"lss_{seed}_{bandwidth}_{channel}.wav"
+            recording = fftconvolve(sweep, impulse_response)
+            sf.write(path, recording / 4, SAMPLE_RATE, subtype="PCM_24")
+            input_dict[channel] = str(path)
+
+        inverse_filter_path = tmp_path / f"lss_{seed}_{bandwidth}_inverse_filter.wav"
+        sf.write(
+            inverse_filter_path, inverse_sweep(sweep), SAMPLE_RATE, subtype="FLOAT"
+        )
+        input_dict["inverse_filter"] = str(inverse_filter_path)
+
+        return input_dict
+
+    return write
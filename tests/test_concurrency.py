@@ -0,0 +1,128 @@
+"""One analyzer shared by concurrent analyses gives the results of serial runs."""
+
+import copy
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from threading import Lock
+
+import core
+from conftest import SIGNAL_PARAMETERS
+from core import SeaUrchinAnalyzer
+from utils.run_context import HEDGEHOG_TXT_NAME, W_CHANNEL_TXT_NAME, RunContext
+
+THREADS = 8
+REPETITIONS = 3
+STAGE_FUNCTIONS = ("read_signals", "bformat_to_intensity", "detect_reflections")
+
+
+def run_analysis(
+    analyzer: SeaUrchinAnalyzer,
+    input_dict: dict,
+    signal_parameters: dict,
+    output_dir: Path,
+) -> tuple:
+    """Runs one analysis and returns its figure and exported text."""
+
+    run_context = RunContext.create(output_dir)
+    fig = analyzer.analyze(
+        input_dict, signal_parameters, run_context=run_context, save_html=False
+    )
+
+    return (
+        fig.to_json(),
+        run_context.path(HEDGEHOG_TXT_NAME).read_text(encoding="utf-8"),
+        run_context.path(W_CHANNEL_TXT_NAME).read_text(encoding="utf-8"),
+    )
+
+
+def test_concurrent_analyses_match_serial(
+    tmp_path, aformat_measurement, lss_measurement
+):
+    inputs = [aformat_measurement(), lss_measurement()]
+    parameter_sets = [
+        {
+            **SIGNAL_PARAMETERS,
+            "integration_time": integration_time,
+            "low_pass_key": low_pass,
+        }
+        for integration_time, low_pass in product((1e-3, 2e-3), (True, False))
+    ]
+    jobs = list(product(range(len(inputs)), range(len(parameter_sets))))
+    snapshots = copy.deepcopy((inputs, parameter_sets))
+
+    serial = {
+        (input_i, parameters_i): run_analysis(
+            SeaUrchinAnalyzer(),
+            inputs[input_i],
+            parameter_sets[parameters_i],
+            tmp_path / "serial" / f"{input_i}_{parameters_i}",
+        )
+        for input_i, parameters_i in jobs
+    }
+
+    shared = SeaUrchinAnalyzer()
+    concurrent_jobs = [
+        (repetition, input_i, parameters_i)
+        for repetition in range(REPETITIONS)
+        for input_i, parameters_i in jobs
+    ]
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = executor.map(
+            lambda job: run_analysis(
+                shared,
+                inputs[job[1]],
+                parameter_sets[job[2]],
+                tmp_path / "concurrent" / "_".join(map(str, job)),
+            ),
+            concurrent_jobs,
+        )
+        for (_, input_i, parameters_i), result in zip(concurrent_jobs, results):
+            assert result == serial[(input_i, parameters_i)]
+
+    assert (inputs, parameter_sets) == snapshots
+
+
+def test_shared_analyzer_computes_each_stage_once(
+    monkeypatch, aformat_measurement, lss_measurement
+):
+    calls = Counter()
+    calls_lock = Lock()
+
+    def counted(name, function):
+        def wrapper(*args, **kwargs):
+            with calls_lock:
+                calls[name] += 1
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    for name in STAGE_FUNCTIONS:
+        monkeypatch.setattr(core, name, counted(name, getattr(core, name)))
+
+    inputs = [aformat_measurement(seed=0), aformat_measurement(seed=1)]
+    inputs.append(lss_measurement())
+    parameter_sets = [
+        {
+            **SIGNAL_PARAMETERS,
+            "integration_time": integration_time,
+            "low_pass_key": low_pass,
+        }
+        for integration_time, low_pass in product((1e-3, 2e-3), (True, False))
+    ]
+    jobs = [
+        (input_dict, signal_parameters)
+        for _ in range(REPETITIONS)
+        for input_dict, signal_parameters in product(inputs, parameter_sets)
+    ]
+
+    shared = SeaUrchinAnalyzer()
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(lambda job: shared.reflections_stage(*job), jobs))
+
+    assert calls == {
+        "read_signals": len(inputs),
+        "bformat_to_intensity": len(inputs) * 2,
+        "detect_reflections": len(inputs) * len(parameter_sets),
+    }
@@ -0,0 +1,65 @@
+"""The FFT low-pass filters match direct-form FIR filtering."""
+
+import numpy as np
+import pytest
+from scipy.signal import lfilter
+
+from utils.filters import (
+    decimation_factor,
+    low_pass_coefficients,
+    low_pass_decimate,
+    low_pass_filter,
+    low_pass_spectrum,
+)
+
+CUTOFF = 500
+CHANNELS = 3
+TOLERANCE = {np.float64: 1e-12, np.float32: 1e-5}
+
+
+def block_length(sample_rate: int) -> int:
+    """Samples of signal in each overlap-add block."""
+
+    fft_length, _ = low_pass_spectrum(CUTOFF, sample_rate)
+
+    return fft_length - len(low_pass_coefficients(CUTOFF, sample_rate)) + 1
+
+
+def direct_filter(signal: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Low-pass filter applied in direct form."""
+
+    return lfilter(low_pass_coefficients(CUTOFF, sample_rate), 1.0, signal, axis=-1)
+
+
+@pytest.mark.parametrize("dtype", (np.float64, np.float32))
+@pytest.mark.parametrize("blocks", (0.3, 1, 3.7))
+@pytest.mark.parametrize("sample_rate", (8000, 48000, 96000))
+def test_low_pass_filter_matches_lfilter(sample_rate, blocks, dtype):
+    length = int(blocks * block_length(sample_rate))
+    signal = np.random.default_rng(0).normal(size=(CHANNELS, length)).astype(dtype)
+
+    filtered = low_pass_filter(signal, CUTOFF, sample_rate)
+
+    assert filtered.dtype == dtype
+    np.testing.assert_allclose(
+        filtered, direct_filter(signal, sample_rate), atol=TOLERANCE[dtype]
+    )
+
+
+@pytest.mark.parametrize("dtype", (np.float64, np.float32))
+@pytest.mark.parametrize("blocks", (0.3, 1, 3.7))
+@pytest.mark.parametrize("sample_rate", (48000, 96000))
+def test_low_pass_decimate_matches_lfilter(sample_rate, blocks, dtype):
+    factor = decimation_factor(CUTOFF, sample_rate)
+    length = int(blocks * block_length(sample_rate)) + 1
+    signal = np.random.default_rng(0).normal(size=(CHANNELS, length)).astype(dtype)
+
+    decimated = low_pass_decimate(signal, CUTOFF, sample_rate, factor)
+
+    assert factor > 1
+    assert decimated.dtype == dtype
+    np.testing.assert_allclose(
+        decimated,
+        direct_filter(signal, sample_rate)[..., ::factor],
+        atol=TOLERANCE[dtype],
+    )
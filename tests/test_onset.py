@@ -0,0 +1,87 @@
+"""The direct sound is found in measurements with full-band arrivals."""
+
+import numpy as np
+import pytest
+
+from conftest import (
+    DIRECT_SOUND_TIME,
+    SAMPLE_RATE,
+    SIGNAL_PARAMETERS,
+    bformat_impulse_response,
+)
+from core import SeaUrchinAnalyzer
+from engine.intensity import (
+    FILTER_CUTOFF,
+    bformat_to_intensity,
+    intensity_decimation_factor,
+    reflection_threshold,
+)
+from engine.w_channel_pre import w_preprocess
+from utils.filters import low_pass_coefficients
+
+LENGTH = 2.0
+DIRECTION_TOLERANCE = 10
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("onset_method", ("peak", "threshold", "matched"))
+def test_full_band_direct_sound(aformat_measurement, seed, onset_method):
+    # The capsule correction rings at Nyquist after every arrival, so the
+    # corrected W channel peaks at a random reflection or later
+    direct_sound = bformat_impulse_response(LENGTH, seed)[
+        :, int(DIRECT_SOUND_TIME * SAMPLE_RATE)
+    ]
+    azimuth = np.degrees(np.arctan2(direct_sound[2], direct_sound[1]))
+    elevation = np.degrees(np.arcsin(direct_sound[3] / direct_sound[0]))
+
+    time, _, _, *peaks = SeaUrchinAnalyzer().reflections_stage(
+        aformat_measurement(LENGTH, seed),
+        {**SIGNAL_PARAMETERS, "onset_method": onset_method},
+    )
+    levels, azimuth_peaks, elevation_peaks, reflections_idx = reflection_threshold(
+        SIGNAL_PARAMETERS["intensity_threshold"], *peaks
+    )
+
+    assert time[reflections_idx[0]] == 0
+    assert levels[0] == 0
+    assert azimuth_peaks[0] == pytest.approx(azimuth, abs=DIRECTION_TOLERANCE)
+    assert elevation_peaks[0] == pytest.approx(elevation, abs=DIRECTION_TOLERANCE)
+
+
+@pytest.mark.parametrize("low_pass", (True, False))
+@pytest.mark.parametrize("onset_method", ("threshold", "matched"))
+def test_stages_share_the_onset(aformat_measurement, onset_method, low_pass):
+    input_dict = aformat_measurement()
+    signal_parameters = {
+        **SIGNAL_PARAMETERS,
+        "onset_method": onset_method,
+        "low_pass_key": low_pass,
+    }
+    analyzer = SeaUrchinAnalyzer()
+
+    bformat, onset_idx, sample_rate, _ = analyzer.bformat_stage(
+        input_dict, signal_parameters
+    )
+    intensity_cropped, _, _ = analyzer.intensity_stage(input_dict, signal_parameters)
+    _, w_channel, _ = analyzer.w_channel_stage(input_dict, signal_parameters)
+
+    w_channel_at_onset, _ = w_preprocess(
+        bformat[0, onset_idx:],
+        int(signal_parameters["integration_time"] * sample_rate),
+        signal_parameters["analysis_length"],
+        sample_rate,
+        0,
+    )
+    np.testing.assert_array_equal(w_channel, w_channel_at_onset)
+
+    # The intensity is delayed by the low-pass filter and decimated
+    decimation = intensity_decimation_factor(sample_rate, low_pass)
+    group_delay = 0
+    if low_pass:
+        group_delay = (len(low_pass_coefficients(FILTER_CUTOFF, sample_rate)) - 1) // 2
+    intensity = bformat_to_intensity(bformat, sample_rate, low_pass, decimation)
+    (intensity_start,) = np.flatnonzero(
+        np.all(intensity == intensity_cropped[:, :1], axis=0)
+    )
+
+    assert abs(intensity_start * decimation - group_delay - onset_idx) <= decimation / 2
@@ -0,0 +1,91 @@
+"""Analyses in single precision stay close to double precision ones."""
+
+from itertools import product
+
+import numpy as np
+import pytest
+
+from conftest import ANTI_ALIASING_BANDWIDTH, SIGNAL_PARAMETERS
+from core import SeaUrchinAnalyzer
+from engine.intensity import reflection_threshold
+from utils.formatter import spherical_to_cartesian
+
+ANGLE_TOLERANCE = 3e-3
+LEVEL_TOLERANCE = 3e-4
+W_ENERGY_TOLERANCE = 3e-2
+
+
+def analyze_precision(input_dict: dict, signal_parameters: dict, precision: str):
+    """Runs the analysis stages and returns the reflections and W channel energy."""
+
+    analyzer = SeaUrchinAnalyzer()
+    signal_parameters = {**signal_parameters, "precision": precision}
+
+    *_, intensity_peaks, azimuth_peaks, elevation_peaks, reflections_idx = (
+        analyzer.reflections_stage(input_dict, signal_parameters)
+    )
+    reflections = reflection_threshold(
+        signal_parameters["intensity_threshold"],
+        intensity_peaks,
+        azimuth_peaks,
+        elevation_peaks,
+        reflections_idx,
+    )
+    _, _, w_energy = analyzer.w_channel_stage(input_dict, signal_parameters)
+
+    return reflections, w_energy
+
+
+def direction_error(
+    azimuth: np.ndarray,
+    elevation: np.ndarray,
+    other_azimuth: np.ndarray,
+    other_elevation: np.ndarray,
+) -> np.ndarray:
+    """Angle in degrees between two sets of directions, along the sphere, so
+    the azimuth of directions close to the poles doesn't weigh more."""
+
+    direction = np.array(spherical_to_cartesian(1, azimuth, elevation))
+    other_direction = np.array(
+        spherical_to_cartesian(1, other_azimuth, other_elevation)
+    )
+
+    return np.rad2deg(
+        np.arctan2(
+            np.linalg.norm(np.cross(direction, other_direction, axis=0), axis=0),
+            np.sum(direction * other_direction, axis=0),
+        )
+    )
+
+
+@pytest.mark.parametrize("measurement", ("aformat_measurement", "lss_measurement"))
+def test_float32_matches_float64(request, measurement):
+    # The capsule correction rings at Nyquist after full-band arrivals, and
+    # rounding that ringing to single precision leaks into the analysed band,
+    # so the measurements are band-limited like real recordings
+    input_dict = request.getfixturevalue(measurement)(bandwidth=ANTI_ALIASING_BANDWIDTH)
+
+    for integration_time, low_pass in product((1e-3, 2e-3), (True, False)):
+        signal_parameters = {
+            **SIGNAL_PARAMETERS,
+            "integration_time": integration_time,
+            "low_pass_key": low_pass,
+        }
+        (levels, azimuths, elevations, idx), w_energy = analyze_precision(
+            input_dict, signal_parameters, "float64"
+        )
+        (levels_32, azimuths_32, elevations_32, idx_32), w_energy_32 = (
+            analyze_precision(input_dict, signal_parameters, "float32")
+        )
+
+        np.testing.assert_array_equal(idx_32, idx)
+        assert np.all(
+            direction_error(azimuths, elevations, azimuths_32, elevations_32)
+            <= ANGLE_TOLERANCE
+        )
+        np.testing.assert_allclose(levels_32, levels, atol=LEVEL_TOLERANCE)
+        # Below the threshold the single precision deconvolution noise shows
+        shown = w_energy >= signal_parameters["intensity_threshold"]
+        np.testing.assert_allclose(
+            w_energy_32[shown], w_energy[shown], atol=W_ENERGY_TOLERANCE
+        )
@@ -0,0 +1,30 @@
+"""Outputs of analyses run without a run context."""
+
+import tempfile
+
+from conftest import SIGNAL_PARAMETERS
+from core import SeaUrchinAnalyzer
+from utils.run_context import (
+    HEDGEHOG_TXT_NAME,
+    HTML_NAME,
+    PLAN_VIEW_JSON_NAME,
+    W_CHANNEL_TXT_NAME,
+)
+
+
+def test_default_outputs_in_working_directory(
+    tmp_path, monkeypatch, aformat_measurement
+):
+    input_dict = aformat_measurement()
+    working_dir = tmp_path / "working"
+    temporary_dir = tmp_path / "temporary"
+    working_dir.mkdir()
+    temporary_dir.mkdir()
+    monkeypatch.chdir(working_dir)
+    monkeypatch.setattr(tempfile, "tempdir", str(temporary_dir))
+
+    SeaUrchinAnalyzer().analyze(input_dict, SIGNAL_PARAMETERS)
+
+    for name in (HTML_NAME, PLAN_VIEW_JSON_NAME, HEDGEHOG_TXT_NAME, W_CHANNEL_TXT_NAME):
+        assert (working_dir / name).is_file()
+    assert not any(temporary_dir.iterdir())